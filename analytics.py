@@ -0,0 +1,177 @@
+import math
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from csr_graph import CSRGraph
+from multi_source import adjacency_matrix
+from profiling import span
+
+# Betweenness is estimated from this many sampled sources unless told otherwise
+DEFAULT_SAMPLES = 256
+# The error bound holds for every node at once with this probability
+DEFAULT_CONFIDENCE = 0.95
+
+
+def pagerank(csr, alpha=0.85, tol=1.0e-6, max_iter=100):
+    """PageRank by power iteration on the sparse adjacency, as nx.pagerank computes it.
+
+    Each iteration is one sparse matrix-vector product over the reverse
+    adjacency; dangling nodes spread their rank uniformly. Returns (scores,
+    iterations); raises RuntimeError if it does not converge in max_iter.
+    """
+    n = csr.number_of_nodes()
+    if n == 0:
+        return np.zeros(0), 0
+    out_degree = csr.out_degrees().astype(np.float64)
+    dangling = out_degree == 0
+    inverse_degree = np.divide(1.0, out_degree, out=np.zeros(n), where=~dangling)
+    incoming = adjacency_matrix(csr, "predecessors")
+    x = np.full(n, 1.0 / n)
+    for iteration in range(1, max_iter + 1):
+        previous = x
+        x = alpha * (incoming @ (previous * inverse_degree)) + (alpha * previous[dangling].sum() + 1 - alpha) / n
+        # Same stopping rule as networkx: l1 change below n * tol
+        if np.abs(x - previous).sum() < n * tol:
+            return x, iteration
+    raise RuntimeError(f"PageRank did not converge in {max_iter} iterations")
+
+
+def core_numbers(csr):
+    """Core number of every node in O(nodes + edges) (Batagelj and Zaversnik).
+
+    As in nx.core_number on a directed graph, a node's degree is its in-
+    plus out-degree and predecessors and successors are both neighbours.
+    Self-loops are ignored rather than rejected.
+    """
+    n = csr.number_of_nodes()
+    sources = np.repeat(np.arange(n), csr.out_degrees())
+    loops = np.bincount(sources[sources == csr.indices], minlength=n)
+    degree = (csr.out_degrees() + csr.in_degrees() - 2 * loops).tolist()
+    indptr, indices = csr.indptr.tolist(), csr.indices.tolist()
+    rev_indptr, rev_indices = csr.rev_indptr.tolist(), csr.rev_indices.tolist()
+
+    # Nodes sorted by degree, with the start of each degree's bin
+    max_degree = max(degree, default=0)
+    bin_start = [0] * (max_degree + 2)
+    for d in degree:
+        bin_start[d + 1] += 1
+    for d in range(1, max_degree + 2):
+        bin_start[d] += bin_start[d - 1]
+    order = np.argsort(np.asarray(degree, dtype=np.int64), kind='stable').tolist()
+    position = [0] * n
+    for i, v in enumerate(order):
+        position[v] = i
+
+    for i in range(n):
+        v = order[i]
+        dv = degree[v]
+        for neighbours, start, end in ((indices, indptr[v], indptr[v + 1]),
+                                       (rev_indices, rev_indptr[v], rev_indptr[v + 1])):
+            for u in neighbours[start:end]:
+                du = degree[u]
+                if du > dv and u != v:
+                    # Move u to the front of its bin, then shrink the bin past it
+                    first = bin_start[du]
+                    w = order[first]
+                    if u != w:
+                        pu = position[u]
+                        order[pu], order[first] = w, u
+                        position[w], position[u] = pu, first
+                    bin_start[du] += 1
+                    degree[u] = du - 1
+    return np.asarray(degree, dtype=np.int64)
+
+
+def _source_dependencies(indptr, indices, source, n):
+    """Brandes dependencies of every node on `source`, by BFS layers.
+
+    The forward pass counts shortest paths (sigma) along the edges from each
+    layer to the next; the backward pass accumulates dependencies over the
+    same edges in reverse.
+    """
+    distance = np.full(n, -1, dtype=np.int32)
+    distance[source] = 0
+    sigma = np.zeros(n)
+    sigma[source] = 1.0
+    frontier = np.array([source], dtype=indices.dtype)
+    layers = []
+    depth = 0
+    while len(frontier):
+        heads, tails = CSRGraph._expand(frontier, indptr, indices)
+        distance[heads[distance[heads] < 0]] = depth + 1
+        on_path = distance[heads] == depth + 1
+        tails, heads = tails[on_path], heads[on_path]
+        sigma += np.bincount(heads, weights=sigma[tails], minlength=n)
+        layers.append((tails, heads))
+        frontier = np.unique(heads)
+        depth += 1
+    delta = np.zeros(n)
+    for tails, heads in reversed(layers):
+        delta += np.bincount(tails, weights=sigma[tails] / sigma[heads] * (1.0 + delta[heads]), minlength=n)
+    delta[source] = 0.0
+    return delta
+
+
+def _dependency_sum(indptr, indices, sources):
+    n = len(indptr) - 1
+    total = np.zeros(n)
+    for source in sources:
+        total += _source_dependencies(indptr, indices, source, n)
+    return total
+
+
+# The adjacency each process worker uses, sent once by _init_worker
+_adjacency = None
+
+
+def _init_worker(indptr, indices):
+    global _adjacency
+    _adjacency = (indptr, indices)
+
+
+def _dependency_sum_in_worker(sources):
+    return _dependency_sum(*_adjacency, sources)
+
+
+def betweenness_error_bound(n, samples, confidence=DEFAULT_CONFIDENCE):
+    """Additive error of sampled, normalized betweenness, for all nodes at once with `confidence`.
+
+    Each sampled source contributes a normalized term in [0, n / (n - 1)],
+    so Hoeffding's inequality with a union bound over the n nodes gives
+    this bound (sampling without replacement only tightens it).
+    """
+    if samples >= n or n < 3:
+        return 0.0
+    spread = n / (n - 1)
+    return spread * math.sqrt(math.log(2 * n / (1 - confidence)) / (2 * samples))
+
+
+def samples_for_error(n, epsilon, confidence=DEFAULT_CONFIDENCE):
+    """Sources to sample so that betweenness_error_bound is at most epsilon."""
+    spread = n / (n - 1) if n > 1 else 1.0
+    return min(n, math.ceil(spread ** 2 * math.log(2 * n / (1 - confidence)) / (2 * epsilon ** 2)))
+
+
+def approximate_betweenness(csr, samples=DEFAULT_SAMPLES, seed=0, workers=None, confidence=DEFAULT_CONFIDENCE):
+    """Normalized betweenness estimated from `samples` random sources, as nx.betweenness_centrality(k=...).
+
+    Dependencies from the sampled sources are scaled by n / samples; with
+    samples >= n every source is used and the result is exact. The sources
+    are split across a process pool of `workers` processes (None or 1 runs
+    in this process), each of which gets the adjacency arrays once. Returns
+    (scores, samples used, error bound at `confidence`).
+    """
+    n = csr.number_of_nodes()
+    samples = min(samples, n)
+    rng = np.random.default_rng(seed)
+    sources = np.arange(n) if samples == n else np.sort(rng.choice(n, samples, replace=False))
+    with span("betweenness sources", "query", samples=samples, workers=workers or 1):
+        if workers is None or workers <= 1 or samples < 2:
+            total = _dependency_sum(csr.indptr, csr.indices, sources)
+        else:
+            # Interleaved chunks keep the per-worker share of expensive sources even
+            chunks = [sources[i::workers] for i in range(workers)]
+            with ProcessPoolExecutor(workers, initializer=_init_worker,
+                                     initargs=(np.asarray(csr.indptr), np.asarray(csr.indices))) as pool:
+                total = sum(pool.map(_dependency_sum_in_worker, chunks))
+    scale = n / samples / ((n - 1) * (n - 2)) if n > 2 else 0.0
+    return total * scale, samples, betweenness_error_bound(n, samples, confidence)
@@ -1,11 +1,30 @@
 import streamlit as st
+import os
+import tempfile
 import json
 import time
+import numpy as np
 from memory_profiler import memory_usage
 from input import get_user_inputs
-from graph_gen import create_base_schema_graph, add_nodes_to_multiple_levels
-from visualize import visualize_graph  
-from graph_query import demonstrate_traversal_methods, get_subgraph
+from graph_gen import load_schema_graph, add_nodes_to_multiple_levels, copy_graph, get_level_index
+from visualize import show_png, visualize_graph
+from graph_query import SUBGRAPH_DIRECTIONS, QueryCache, TraversalResult, get_subgraph
+from background import GenerationJob
+from csr_graph import CSRGraph
+from graph_versions import GraphHistory
+from export import EXPORT_FORMATS, export_filename, export_graph, export_mime, graph_preview
+from snapshot import EXTENSION as SNAPSHOT_EXTENSION, load_snapshot, save_snapshot
+from cache import LRUCache, content_key, csr_nbytes, graph_nbytes
+from shortest_path import PATH_ENGINES
+from degree_index import DEGREE_KINDS
+from analytics import DEFAULT_SAMPLES
+from reachability import build_in_background as build_reachability_index
+import profiling
+from profiling import span
+
+DEFAULT_CACHE_MIB = 512
+# Larger graphs are not drawn, so a loaded snapshot only gets a networkx graph up to this size
+DRAW_NODE_LIMIT = 2000
 
 def main():
     st.title("Graph Generator App")
@@ -14,18 +33,37 @@ def main():
     app_mode = st.sidebar.selectbox("Choose the app mode",
         ["Graph Generation", "Graph Query"])
 
+    cache_stats = graph_cache_sidebar()
+    query_cache_stats = query_cache_sidebar()
+    profiling_sidebar()
+
     if app_mode == "Graph Generation":
         graph_generation()
     elif app_mode == "Graph Query":
         graph_query()
 
+    # Filled in last so the counters include this rerun's lookups
+    cache_stats.json(get_graph_cache().stats(), expanded=False)
+    query_cache_stats.json(get_query_cache().stats(), expanded=False)
+
 
 def graph_generation():
     # File upload for JSON
     uploaded_file = st.file_uploader("Choose a JSON file", type="json")
+
+    # Or reopen a previously saved binary snapshot without regenerating
+    snapshot_file = st.file_uploader("Load snapshot", type=SNAPSHOT_EXTENSION.lstrip("."))
+    if snapshot_file is not None:
+        load_uploaded_snapshot(snapshot_file)
+
+    # A background run outlives reruns and widget changes, so it is shown regardless of the inputs
+    generation_job_section()
+
     if uploaded_file is not None:
-        json_data = uploaded_file.read().decode("utf-8")
-        base_graph = create_base_schema_graph(json_data)
+        graph_cache = get_graph_cache()
+        schema_key = content_key(uploaded_file.getvalue())
+        base_graph = graph_cache.get_or_create(("schema", schema_key), lambda: read_schema_upload(uploaded_file),
+                                               sizeof=graph_nbytes)
         st.success("Base graph created successfully!")
         st.write(f"Base graph nodes: {base_graph.number_of_nodes()}")
         st.write(f"Base graph edges: {base_graph.number_of_edges()}")
@@ -33,24 +71,49 @@ def graph_generation():
         # Get user inputs
         inputs = get_user_inputs()
 
-        start_time = time.time()
-        before_usage = memory_usage()[0]
+        export_format = st.radio("Export format", list(EXPORT_FORMATS))
+        compress_export = st.checkbox("Compress export (gzip)")
+        run_in_background = st.checkbox("Run in background",
+                                        help="Keep the page responsive, show progress per level and allow "
+                                             "cancelling; the graph is installed for querying when done")
 
-        if st.button("Generate Graph"):
-            updated_graph = add_nodes_to_multiple_levels(
-                base_graph,
-                inputs['level_node_dict'],
-                inputs['connections_per_node'],
-                inputs['jump_probability'],
-                inputs['probability_distribution']
-            )
+        generation_key = ("graph", content_key(schema_key, inputs))
+        generate = st.button("Generate Graph")
+        if generate and run_in_background and generation_key not in graph_cache:
+            start_background_generation(base_graph, inputs, generation_key)
+            generate = False
 
-            
+        if generate:
+            profiling.reset()
+            # Measure from the click, not from the page rerun that draws the button
+            start_time = time.perf_counter()
+            before_usage = memory_usage()[0]
+            cached = graph_cache.get(generation_key)
+            if cached is not None:
+                updated_graph, csr_graph = cached
+                st.info("Loaded this configuration from the graph cache")
+            else:
+                # Generate into a copy so the cached base graph stays pristine
+                updated_graph = add_nodes_to_multiple_levels(
+                    copy_graph(base_graph),
+                    inputs['level_node_dict'],
+                    inputs['connections_per_node'],
+                    inputs['jump_probability'],
+                    inputs['probability_distribution'],
+                    inputs['engine'],
+                    inputs['batched'],
+                    inputs['seed'],
+                    inputs['workers']
+                )
+                with span("csr snapshot", "generation"):
+                    csr_graph = CSRGraph.from_networkx(updated_graph)
+                graph_cache.put(generation_key, (updated_graph, csr_graph),
+                                graph_nbytes(updated_graph) + csr_nbytes(csr_graph))
 
             st.success("Graph generated successfully!")
             st.write(f"Total nodes: {updated_graph.number_of_nodes()}")
             st.write(f"Total edges: {updated_graph.number_of_edges()}")
-            end_time = time.time()
+            end_time = time.perf_counter()
             after_usage = memory_usage()[0]
             memory_used = after_usage - before_usage
             st.write("Memory used in MiB -Mega Binary Bytes : ", memory_used)
@@ -58,41 +121,266 @@ def graph_generation():
             st.write ("Time taken for Graph Generation: ",time_taken)
 
             # Visualize the graph
-            if updated_graph.number_of_nodes() <= 2000:
+            if updated_graph.number_of_nodes() <= DRAW_NODE_LIMIT:
                 visualize_graph(updated_graph)
-        else:
-            st.warning("Graph is too large to visualize (> 2000 nodes)")
-            
+            else:
+                st.warning(f"Graph is too large to visualize (> {DRAW_NODE_LIMIT} nodes)")
+
+            # Show a bounded preview instead of the whole document
+            st.subheader("Generated Graph (JSON preview)")
+            st.json(graph_preview(updated_graph))
+
+            # Stream the export to a temp file and serve the download from it
+            export_path = replace_temp_file('export_path', "")
+            export_graph(updated_graph, export_format, compress_export, export_path)
+            with open(export_path, "rb") as export_file:
+                st.download_button(
+                    label=f"Download {export_format}",
+                    data=export_file,
+                    file_name=export_filename(export_format, compress_export),
+                    mime=export_mime(export_format, compress_export)
+                )
+
+            # Store the graph in session state for use in graph_query, with
+            # its frozen CSR snapshot built once per generation rather than per query
+            store_graph(updated_graph, csr_graph)
+
+            snapshot_path = replace_temp_file('download_snapshot_path', SNAPSHOT_EXTENSION)
+            with span("save snapshot", "serialization"):
+                save_snapshot(csr_graph, snapshot_path)
+            with open(snapshot_path, "rb") as snapshot_data:
+                st.download_button(
+                    label="Download snapshot",
+                    data=snapshot_data,
+                    file_name="generated_graph" + SNAPSHOT_EXTENSION,
+                    mime="application/octet-stream"
+                )
+
+            show_profile()
+
+        append_levels_section(inputs)
+
+
+def start_background_generation(base_graph, inputs, generation_key):
+    job = st.session_state.get('generation_job')
+    if job is not None and job.running:
+        st.warning("A background generation is already running; cancel it first.")
+        return
+    st.session_state['generation_job'] = GenerationJob(base_graph, inputs, generation_key).start()
+    st.rerun()
+
+
+def generation_job_section():
+    job = st.session_state.get('generation_job')
+    if job is None:
+        return
+    # Only poll while the worker runs; a finished job is rendered once
+    st.fragment(generation_job_progress, run_every=1.0 if job.running else None)()
+
+
+def generation_job_progress():
+    job = st.session_state.get('generation_job')
+    if job is None:
+        return
+    st.subheader("Background generation")
+    total = len(job.inputs['level_node_dict'])
+    st.progress(job.fraction, text=f"{len(job.levels)}/{total} levels in {job.elapsed:.1f}s")
+    if job.levels:
+        latest = job.levels[-1]
+        st.write(f"{latest['total_nodes']} nodes, {latest['total_edges']} edges, "
+                 f"{latest['nodes_per_second']:.0f} nodes/s")
+        st.dataframe(job.levels)
+
+    if job.running:
+        if st.button("Cancel generation"):
+            job.cancel()
+            st.info("Cancelling after the current level...")
+        return
+
+    if job.status == "done" and not job.installed:
+        # Hand the finished graph over in one step, then rerun the page so everything sees it
+        graph, csr_graph = job.result()
+        get_graph_cache().put(job.key, (graph, csr_graph), graph_nbytes(graph) + csr_nbytes(csr_graph))
+        store_graph(graph, csr_graph)
+        job.installed = True
+        st.rerun(scope="app")
+    elif job.status == "done":
+        st.success("Background generation finished; the graph is ready in the Graph Query tab.")
+    elif job.status == "cancelled":
+        st.warning("Background generation was cancelled; the previous graph is unchanged.")
+    else:
+        st.error(f"Background generation failed: {job.error!r}")
+    if st.button("Dismiss"):
+        del st.session_state['generation_job']
+        st.rerun(scope="app")
+
+
+def append_levels_section(inputs):
+    """Grow the current graph in place and roll back to earlier versions without regenerating."""
+    history = st.session_state.get('graph_history')
+    if history is None:
+        return
+    st.subheader("Append levels")
+    current = st.empty()
+    num_levels = st.number_input("Levels to append", min_value=1, value=1, key="append_num_levels")
+    nodes_per_level = st.number_input("Nodes per appended level", min_value=1, value=1000, key="append_nodes")
+    if st.button("Append levels", help="Uses the generation settings above; the seed is offset by the version "
+                                       "number so repeated appends differ"):
+        profiling.reset()
+        version = history.append_levels(
+            {level: nodes_per_level for level in range(num_levels)},
+            connections_per_node=inputs['connections_per_node'],
+            jump_probability=inputs['jump_probability'],
+            probability_distribution=inputs['probability_distribution'],
+            engine=inputs['engine'],
+            batched=inputs['batched'],
+            seed=inputs['seed'] + len(history.versions),
+            workers=inputs['workers']
+        )
+        store_graph(history.graph, history.csr, history)
+        st.success(f"Appended {version}")
+        show_profile()
+
+    if len(history.versions) > 1:
+        number = st.selectbox("Earlier versions", range(len(history.versions) - 1),
+                              format_func=lambda n: str(history.versions[n]), key="rollback_version")
+        if st.button("Roll back"):
+            profiling.reset()
+            version = history.rollback(number)
+            store_graph(history.graph, history.csr, history)
+            st.success(f"Rolled back to {version}")
+            show_profile()
+
+    # Filled in last so it reflects this rerun's append or rollback
+    current.write(f"Current version: {history.current}")
+
 
-            # Convert graph to JSON and display
-        graph_json = json.dumps(dict(nodes=list(updated_graph.nodes(data=True)),
-                                         edges=list(updated_graph.edges(data=True))),
-                                    indent=2)
-        st.subheader("Generated Graph (JSON)")
-        st.json(graph_json)
+def get_graph_cache():
+    # Lives in session state so it survives Streamlit reruns
+    if 'graph_cache' not in st.session_state:
+        st.session_state['graph_cache'] = LRUCache(max_bytes=DEFAULT_CACHE_MIB * 2**20)
+    return st.session_state['graph_cache']
 
-            # Download button for JSON
-        st.download_button(
-                label="Download JSON",
-                data=graph_json,
-                file_name="generated_graph.json",
-                mime="application/json"
-            )
 
-            # Store the graph in session state for use in graph_query
-        st.session_state['graph'] = updated_graph
+def graph_cache_sidebar():
+    graph_cache = get_graph_cache()
+    budget_mib = st.sidebar.number_input("Graph cache budget (MiB)", min_value=0, value=DEFAULT_CACHE_MIB, step=64)
+    graph_cache.resize(max_bytes=budget_mib * 2**20)
+    st.sidebar.caption("Graph cache")
+    return st.sidebar.empty()
 
 
+def get_query_cache():
+    if 'query_cache' not in st.session_state:
+        st.session_state['query_cache'] = QueryCache()
+    return st.session_state['query_cache']
+
+
+def query_cache_sidebar():
+    st.sidebar.caption("Query cache")
+    return st.sidebar.empty()
+
+
+def profiling_sidebar():
+    st.sidebar.caption("Profiling")
+    if st.sidebar.checkbox("Record per-phase profile", key="profiling",
+                           help="Recording is shared by every session of this server; profile one user at a time"):
+        profiling.enable(trace_memory=st.sidebar.checkbox("Trace allocations (tracemalloc)", key="trace_memory"))
+    elif profiling.is_enabled():
+        profiling.disable()
+
+
+def show_profile():
+    """Per-phase breakdown of the last action, with a Chrome trace download."""
+    if not profiling.is_enabled() or not profiling.events():
+        return
+    st.subheader("Profile")
+    st.dataframe(profiling.summary())
+    st.download_button(
+        label="Download Chrome trace",
+        data=json.dumps(profiling.chrome_trace()),
+        file_name="graph_app_trace.json",
+        mime="application/json"
+    )
+
+
+def store_graph(graph, csr_graph, history=None, owned=False):
+    st.session_state['graph'] = graph
+    st.session_state['csr_graph'] = csr_graph
+    # Set again by load_uploaded_snapshot when the graph is the uploaded snapshot
+    st.session_state.pop('snapshot_source', None)
+    # A newly generated or loaded graph starts its own version history; appending needs networkx
+    if history is None and graph is not None:
+        history = GraphHistory(graph, csr_graph, owned=owned)
+    st.session_state['graph_history'] = history
+    # Cached query results and drawings refer to the previous graph; drop them now rather than
+    # on the next Graph Query rerun, so it can be freed
+    get_query_cache().clear()
+    st.session_state.pop('traversal_result', None)
+    # Build the reachability index while the user gets to Graph Query, not on their first click
+    if csr_graph is not None:
+        build_reachability_index(csr_graph)
+
+
+def replace_temp_file(key, suffix):
+    """Remove the temp file last stored under `key` and reserve a new one in its place."""
+    previous = st.session_state.pop(key, None)
+    if previous and os.path.exists(previous):
+        os.remove(previous)
+    fd, path = tempfile.mkstemp(prefix="graph_app_", suffix=suffix)
+    os.close(fd)
+    st.session_state[key] = path
+    return path
+
+
+def read_schema_upload(uploaded_file):
+    # Parse straight from the upload buffer instead of decoding it into one big string first
+    uploaded_file.seek(0)
+    return load_schema_graph(uploaded_file)
+
+
+def load_uploaded_snapshot(snapshot_file):
+    # Every upload gets its own file_id, so re-uploading a file (or another file with the same name
+    # and size) reloads it, while reruns keep the mapped one
+    if st.session_state.get('snapshot_upload') != snapshot_file.file_id:
+        # The arrays stay memory-mapped, so the file has to outlive this rerun
+        snapshot_path = replace_temp_file('uploaded_snapshot_path', SNAPSHOT_EXTENSION)
+        with open(snapshot_path, "wb") as f:
+            f.write(snapshot_file.getbuffer())
+        csr_graph = load_snapshot(snapshot_path)
+        # Queries run on the mapped arrays; networkx is only built for a graph small enough to draw
+        small = csr_graph.number_of_nodes() <= DRAW_NODE_LIMIT
+        store_graph(csr_graph.to_networkx() if small else None, csr_graph, owned=True)
+        st.session_state['snapshot_upload'] = st.session_state['snapshot_source'] = snapshot_file.file_id
+
+    # store_graph forgets the source once another graph is installed
+    if st.session_state.get('snapshot_source') != snapshot_file.file_id:
+        st.info("Another graph has replaced this snapshot; upload it again to reopen it.")
+        return
+    csr_graph = st.session_state['csr_graph']
+    st.success("Snapshot loaded! Open the Graph Query tab to query it.")
+    st.write(f"Snapshot nodes: {csr_graph.number_of_nodes()}")
+    st.write(f"Snapshot edges: {csr_graph.number_of_edges()}")
+
 def graph_query():
-    if 'graph' not in st.session_state:
+    if st.session_state.get('graph') is None and st.session_state.get('csr_graph') is None:
         st.warning("Please generate a graph first in the Graph Generation tab.")
         return
 
     updated_graph = st.session_state['graph']
+    csr_graph = st.session_state.get('csr_graph')
+    # Drop cached results as soon as the graph has been replaced, extended or rolled back
+    query_cache = get_query_cache()
+    query_cache.validate(updated_graph, csr_graph)
     
-    # Extract node IDs and levels
-    node_info = {node: data for node, data in updated_graph.nodes(data=True)}
-    levels = sorted(set(data.get('level', 0) for data in node_info.values()))
+    # Levels and their nodes come from the index kept with the graph, or from a snapshot's level array
+    if updated_graph is not None:
+        level_index = get_level_index(updated_graph)
+        levels = sorted(level_index)
+        level_nodes = lambda level: level_index[level]
+    else:
+        levels = np.unique(csr_graph.levels).tolist()
+        level_nodes = lambda level: csr_graph.to_names(np.flatnonzero(csr_graph.levels == level))
 
     # Query methods
     st.subheader("Query Methods")
@@ -103,45 +391,136 @@ def graph_query():
         "All Simple Paths",
         "Descendants and Ancestors",
         "Degree Centrality",
-        "Subgraph Extraction"
+        "Subgraph Extraction",
+        "Level Reachability",
+        "PageRank",
+        "Approximate Betweenness",
+        "K-Core Decomposition"
     ])
 
     # Initialize variables
     source = None
     target = None
     max_depth = 3
+    path_engine = PATH_ENGINES[0]
+    degree_kind = DEGREE_KINDS[0]
+    query_level = None
+    direction = SUBGRAPH_DIRECTIONS[0]
+    max_nodes = None
+    samples = DEFAULT_SAMPLES
+    workers = None
 
     # Common inputs for most query methods
     if query_method in ["Depth-First Search (DFS)", "Breadth-First Search (BFS)", "Descendants and Ancestors", "Shortest Path", "All Simple Paths", "Subgraph Extraction"]:
         source_level = st.selectbox("Select source node level", levels, key="source_level")
-        source_nodes = [node for node, data in node_info.items() if data.get('level', 0) == source_level]
+        source_nodes = level_nodes(source_level)
         source = st.selectbox("Select source node", source_nodes, key="source")
 
     # Additional inputs for specific query methods
     if query_method in ["Shortest Path", "All Simple Paths"]:
         target_level = st.selectbox("Select target node level", levels, key="target_level")
-        target_nodes = [node for node, data in node_info.items() if data.get('level', 0) == target_level]
+        target_nodes = level_nodes(target_level)
         target = st.selectbox("Select target node", target_nodes, key="target")
 
+    if query_method == "Shortest Path":
+        engines = PATH_ENGINES if updated_graph is not None else [e for e in PATH_ENGINES if e != "networkx"]
+        path_engine = st.radio("Shortest path engine", engines, key="path_engine",
+                               help="Switch engines to compare nodes expanded and latency for the same query")
+
+    if query_method == "Approximate Betweenness":
+        samples = st.number_input("Sampled sources", min_value=1, value=DEFAULT_SAMPLES, key="betweenness_samples",
+                                  help="More sources tighten the error bound; at least the node count is exact")
+        workers = st.number_input("Worker processes", min_value=1, max_value=os.cpu_count() or 1, value=1,
+                                  key="betweenness_workers")
+
+    if query_method in ["PageRank", "Approximate Betweenness", "K-Core Decomposition"]:
+        level_choice = st.selectbox("List top nodes on", ["All levels"] + levels, key="analytics_level")
+        query_level = None if level_choice == "All levels" else level_choice
+
+    if query_method == "Degree Centrality":
+        degree_kind = st.selectbox("Degree type", DEGREE_KINDS, key="degree_kind")
+        level_choice = st.selectbox("Level", ["All levels"] + levels, key="centrality_level")
+        query_level = None if level_choice == "All levels" else level_choice
+
     if query_method == "Subgraph Extraction":
         max_depth = st.number_input("Maximum depth", min_value=1, value=3, key="max_depth")
+        direction = st.selectbox("Follow", SUBGRAPH_DIRECTIONS, key="subgraph_direction")
+        node_cap = st.number_input("Node cap (0 for no cap)", min_value=0, value=2000, key="subgraph_node_cap")
+        max_nodes = node_cap or None
+
+    if query_method == "Level Reachability":
+        query_level = st.selectbox("Sources: every node on level", levels, key="reach_level")
+        depth_limit = st.number_input("Maximum depth (0 for no limit)", min_value=0, value=0, key="reach_max_depth")
+        max_depth = depth_limit or None
+        direction = st.selectbox("Follow", SUBGRAPH_DIRECTIONS, key="reach_direction")
+
+    if query_method in ["Depth-First Search (DFS)", "Breadth-First Search (BFS)"]:
+        node_limit = st.number_input("Stop after this many nodes (0 for no limit)", min_value=0, value=0,
+                                     key="traversal_node_limit")
+        max_nodes = node_limit or None
 
     if st.button("Run Query"):
-        result = demonstrate_traversal_methods(
+        profiling.reset()
+        result, figures, hit = query_cache.run(
             updated_graph, 
             query_method, 
             source, 
             target if query_method in ["Shortest Path", "All Simple Paths"] else None,
-            max_depth if query_method == "Subgraph Extraction" else None
+            max_depth if query_method in ["Subgraph Extraction", "Level Reachability"] else None,
+            csr_graph,
+            path_engine,
+            degree_kind,
+            query_level,
+            direction,
+            max_nodes,
+            samples,
+            workers
         )
-        st.write(result)
+        for figure in figures:
+            show_png(figure)
+        if hit:
+            st.caption("Result from the query cache")
+        if isinstance(result, TraversalResult):
+            # Kept across reruns so paging reads further into the same traversal
+            st.session_state['traversal_result'] = (query_method, updated_graph, csr_graph, result)
+            st.session_state['traversal_page'] = 1
+        else:
+            st.session_state.pop('traversal_result', None)
+            st.write(result)
 
         # Visualization
-        if updated_graph.number_of_nodes() <= 2000:
+        if updated_graph is not None and updated_graph.number_of_nodes() <= DRAW_NODE_LIMIT:
             st.subheader("Graph Visualization")
-            visualize_graph(updated_graph)
+            show_png(query_cache.figure("graph", lambda: visualize_graph(updated_graph, show=False)))
         else:
-            st.warning("Graph is too large to visualize (> 2000 nodes)")
+            st.warning(f"Graph is too large to visualize (> {DRAW_NODE_LIMIT} nodes)")
+
+        show_profile()
+
+    traversal_results(query_method, updated_graph)
+
+def traversal_results(query_method, graph):
+    # Only show a stored traversal for the selected method and the graph and snapshot it ran on
+    stored = st.session_state.get('traversal_result')
+    if stored is None:
+        return
+    method, stored_graph, stored_csr, result = stored
+    if method != query_method or stored_graph is not graph or stored_csr is not st.session_state.get('csr_graph'):
+        return
+
+    st.subheader(result.title)
+    page = st.number_input("Page", min_value=1, key="traversal_page")
+    offset = (page - 1) * result.page_size
+    nodes = result.page(page - 1)
+    if nodes:
+        st.dataframe({"position": list(range(offset + 1, offset + len(nodes) + 1)), "node": nodes}, hide_index=True)
+    else:
+        st.info("No nodes on this page.")
+
+    if result.exhausted or st.button("Count all visited nodes", key="traversal_count"):
+        st.caption(f"{result.total()} nodes in total, {result.num_pages()} pages of {result.page_size}")
+    else:
+        st.caption(f"Showing nodes {offset + 1}-{offset + len(nodes)}; the traversal has only run this far")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
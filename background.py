@@ -0,0 +1,104 @@
+import threading
+import time
+from csr_graph import CSRGraph
+from graph_gen import add_nodes_to_multiple_levels, copy_graph
+
+
+class GenerationCancelled(Exception):
+    pass
+
+
+class GenerationJob:
+    """Graph generation running in a background thread, with per-level progress.
+
+    The worker generates into a copy of the base graph, so cancelling (which
+    takes effect at the next level boundary) simply discards that copy. A
+    thread rather than a process is used because the finished networkx graph
+    would otherwise have to be pickled back in full. The result is published
+    in one assignment under a lock, so readers see either nothing or the
+    complete (graph, csr) pair.
+    """
+
+    def __init__(self, base_graph, inputs, key=None):
+        self.base_graph = base_graph
+        self.inputs = inputs
+        self.key = key
+        self.levels = []
+        self.status = "pending"
+        self.error = None
+        # Set by the UI once the result has been handed to the session
+        self.installed = False
+        self._result = None
+        self._lock = threading.Lock()
+        self._cancel = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="graph-generation", daemon=True)
+        self.started = None
+        self.finished = None
+
+    def start(self):
+        self.started = time.perf_counter()
+        self.status = "running"
+        self._thread.start()
+        return self
+
+    def cancel(self):
+        self._cancel.set()
+
+    def _on_level(self, info):
+        info["elapsed"] = time.perf_counter() - self.started
+        added = sum(level["nodes_added"] for level in self.levels) + info["nodes_added"]
+        info["nodes_per_second"] = added / info["elapsed"] if info["elapsed"] > 0 else 0.0
+        self.levels.append(info)
+        if self._cancel.is_set():
+            raise GenerationCancelled()
+
+    def _run(self):
+        inputs = self.inputs
+        try:
+            if self._cancel.is_set():
+                raise GenerationCancelled()
+            graph = add_nodes_to_multiple_levels(
+                copy_graph(self.base_graph),
+                inputs['level_node_dict'],
+                inputs['connections_per_node'],
+                inputs['jump_probability'],
+                inputs['probability_distribution'],
+                inputs['engine'],
+                inputs['batched'],
+                inputs['seed'],
+                inputs['workers'],
+                progress=self._on_level
+            )
+            csr = CSRGraph.from_networkx(graph)
+            with self._lock:
+                self._result = (graph, csr)
+                self.status = "done"
+        except GenerationCancelled:
+            self.status = "cancelled"
+        except Exception as e:
+            self.error = e
+            self.status = "failed"
+        finally:
+            self.finished = time.perf_counter()
+
+    @property
+    def running(self):
+        return self.status in ("pending", "running")
+
+    @property
+    def fraction(self):
+        total = len(self.inputs['level_node_dict'])
+        return len(self.levels) / total if total else 1.0
+
+    @property
+    def elapsed(self):
+        return (self.finished or time.perf_counter()) - self.started if self.started else 0.0
+
+    def result(self):
+        """(graph, csr) once done, otherwise None."""
+        with self._lock:
+            return self._result
+
+    def wait(self, timeout=None):
+        self._thread.join(timeout)
+        return self.result()
@@ -0,0 +1,201 @@
+"""Run graph queries from a JSONL file without the Streamlit UI.
+
+    python batch_query.py graph.gsnap queries.jsonl -o results.jsonl --workers 4
+
+Each query line is an object with a "method" named like the Graph Query page
+("Shortest Path", "Degree Centrality", ...) plus the inputs that method needs:
+source, target, max_depth, path_engine, degree_kind, level, direction,
+max_nodes, and samples and workers for "Approximate Betweenness". Methods are
+answered by csr_queries.py, as on the Graph Query page. An optional "id" is
+echoed back. Each result line carries the query id, method, the result (or
+an error) and the latency in milliseconds.
+
+The graph is a snapshot (.gsnap) or a JSON/NDJSON export. Queries run on the
+read-only CSR arrays: threads share one snapshot, and process workers each
+memory-map the same snapshot file, so the graph is loaded once per machine.
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import numpy as np
+from analytics import DEFAULT_SAMPLES
+from csr_graph import CSRGraph
+from csr_queries import (ANALYTICS_METHODS, TRAVERSAL_METHODS, analytics, degree_centrality,
+                         descendants_and_ancestors, edges_within, level_reachability, shortest_path,
+                         simple_paths, visit_order)
+from export import read_graph_json
+from path_count import LIST_LIMIT, PATH_COUNT_BUDGET
+from reachability import reachability_index
+from shortest_path import shortest_path_engine
+from snapshot import EXTENSION, load_snapshot, save_snapshot
+
+# The snapshot each process worker queries, opened once by _init_worker
+_csr = None
+
+
+def load_graph(path):
+    """A CSRGraph for a snapshot or a JSON/NDJSON export (optionally .gz)."""
+    if path.endswith(EXTENSION):
+        return load_snapshot(path)
+    return CSRGraph.from_networkx(read_graph_json(path))
+
+
+def _named(csr, pairs):
+    """[[name, value], ...] for (id, value) pairs."""
+    ids = [i for i, _ in pairs]
+    return [[name, value] for name, (_, value) in zip(csr.to_names(ids), pairs)]
+
+
+def run_query(csr, query, limit=LIST_LIMIT):
+    """Answer one query dict on a CSRGraph and return a JSON-serializable result."""
+    method = query["method"]
+    source = csr.node_id(query["source"]) if query.get("source") is not None else None
+    target = csr.node_id(query["target"]) if query.get("target") is not None else None
+    level = query.get("level")
+
+    if method in TRAVERSAL_METHODS:
+        order = visit_order(csr, method, source)
+        return {"count": len(order), "order": csr.to_names(order[:limit])}
+
+    if method == "Shortest Path":
+        path, expanded = shortest_path(csr, source, target, query.get("path_engine", "landmark"))
+        return {"path": csr.to_names(path) if path is not None else None, "expanded": expanded}
+
+    if method == "All Simple Paths":
+        counted = simple_paths(csr, source, target, query.get("cutoff", 5),
+                               query.get("time_budget", PATH_COUNT_BUDGET))
+        counted["examples"] = [csr.to_names(path) for path in counted["examples"]]
+        return counted
+
+    if method == "Descendants and Ancestors":
+        found = descendants_and_ancestors(csr, source, limit)
+        found["descendants"] = csr.to_names(found["descendants"])
+        found["ancestors"] = csr.to_names(found["ancestors"])
+        return found
+
+    if method == "Degree Centrality":
+        top, centrality = degree_centrality(csr, query.get("degree_kind", "total"), level)
+        return {"top": _named(csr, list(zip(top.tolist(), centrality.tolist())))}
+
+    if method == "Subgraph Extraction":
+        ids, depths, truncated = csr.depth_limited_bfs(source, query.get("max_depth", 3),
+                                                       query.get("direction", "successors"),
+                                                       query.get("max_nodes"))
+        return {"nodes": len(ids), "edges": edges_within(csr, ids),
+                "nodes_per_depth": np.bincount(depths).tolist(), "truncated": truncated}
+
+    if method == "Level Reachability":
+        reach = level_reachability(csr, level, query.get("max_depth"), query.get("direction", "successors"))
+        reached = reach["reached"]
+        return {"level": reach["level"], "sources": len(reach["sources"]),
+                "reached": {"min": int(reached.min()), "mean": float(reached.mean()), "max": int(reached.max())},
+                "farthest": int(reach["farthest"].max()), "reached_by_any": reach["reached_by_any"],
+                "top": _named(csr, reach["top"])}
+
+    if method in ANALYTICS_METHODS:
+        found = analytics(csr, method, level, query.get("samples", DEFAULT_SAMPLES), query.get("workers"))
+        found["top"] = _named(csr, found["top"])
+        return found
+
+    raise ValueError(f"Unknown query method: {method}")
+
+
+def indexes_needed(queries):
+    """The per-snapshot indexes ("reachability", "landmarks") a batch of queries will use."""
+    needed = set()
+    for query in queries:
+        if query.get("method") == "Descendants and Ancestors":
+            needed.add("reachability")
+        elif query.get("method") == "Shortest Path" and query.get("path_engine", "landmark") == "landmark":
+            needed.add("landmarks")
+    return needed
+
+
+def build_indexes(csr, needed):
+    """Build the indexes up front, before any worker starts, rather than racing to build them in queries."""
+    if "reachability" in needed:
+        reachability_index(csr)
+    if "landmarks" in needed:
+        shortest_path_engine(csr).landmarks
+
+
+def _timed(csr, query, limit):
+    start = time.perf_counter()
+    record = {"id": query.get("id"), "method": query.get("method")}
+    try:
+        record["result"] = run_query(csr, query, limit)
+    except Exception as e:
+        record["error"] = f"{type(e).__name__}: {e}"
+    record["latency_ms"] = (time.perf_counter() - start) * 1000
+    return record
+
+
+def _init_worker(snapshot_path, needed):
+    global _csr
+    _csr = load_snapshot(snapshot_path)
+    build_indexes(_csr, needed)
+
+
+def _run_in_worker(query, limit):
+    return _timed(_csr, query, limit)
+
+
+def run_batch(graph_path, queries, workers=1, executor="thread", limit=LIST_LIMIT, chunksize=16):
+    """Yield a result record per query, in input order.
+
+    executor is "thread" or "process". Process workers need a snapshot to
+    memory-map, so JSON exports are converted to a temporary one first.
+    Indexes the queries share are built before the queries run: once for
+    all threads, once per process worker.
+    """
+    if executor == "thread" or workers <= 1:
+        csr = load_graph(graph_path)
+        build_indexes(csr, indexes_needed(queries))
+        if workers <= 1:
+            for query in queries:
+                yield _timed(csr, query, limit)
+            return
+        with ThreadPoolExecutor(workers) as pool:
+            yield from pool.map(lambda query: _timed(csr, query, limit), queries)
+        return
+
+    temp_path = None
+    if not graph_path.endswith(EXTENSION):
+        fd, temp_path = tempfile.mkstemp(prefix="batch_query_", suffix=EXTENSION)
+        os.close(fd)
+        save_snapshot(load_graph(graph_path), temp_path)
+    try:
+        with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(temp_path or graph_path, indexes_needed(queries))) as pool:
+            yield from pool.map(_run_in_worker, queries, [limit] * len(queries), chunksize=chunksize)
+    finally:
+        if temp_path is not None:
+            os.remove(temp_path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run Graph Query methods from a JSONL file.")
+    parser.add_argument("graph", help=f"graph snapshot ({EXTENSION}) or JSON/NDJSON export")
+    parser.add_argument("queries", help="JSONL file of queries, '-' for stdin")
+    parser.add_argument("-o", "--output", default="-", help="JSONL results file, '-' for stdout")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--executor", choices=["thread", "process"], default="process")
+    parser.add_argument("--limit", type=int, default=LIST_LIMIT, help="node names kept per list result")
+    args = parser.parse_args(argv)
+
+    source = sys.stdin if args.queries == "-" else open(args.queries, encoding="utf-8")
+    with source:
+        queries = [json.loads(line) for line in source if line.strip()]
+    out = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+    start = time.perf_counter()
+    with out:
+        for record in run_batch(args.graph, queries, args.workers, args.executor, args.limit):
+            out.write(json.dumps(record) + "\n")
+    print(f"{len(queries)} queries in {time.perf_counter() - start:.2f}s", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
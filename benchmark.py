@@ -0,0 +1,211 @@
+"""Scaling benchmarks for graph generation and the Graph Query methods.
+
+    python benchmark.py run -o bench.json --scales 0.01 0.1 --levels 10 27
+    python benchmark.py compare base.json bench.json --threshold 0.2
+
+`run` sweeps graph size (a scale factor on the 29-level layout from the
+graph_gen.py driver), the number of generated levels, connections_per_node
+and jump_probability. For every configuration it times generation, the CSR
+snapshot build and each query method (with drawing disabled, and DFS/BFS
+read to the end of their lazily computed visit order) over a seeded sample
+of sources and targets. It records wall time, peak RSS and throughput as
+JSON.
+
+`compare` matches records by configuration and phase, prints the change in
+time per item and in peak RSS, and exits with status 1 if any phase got
+slower by more than the threshold (phases too short to time reliably are
+not flagged).
+"""
+import argparse
+import itertools
+import json
+import platform
+import random
+import sys
+import time
+from memory_profiler import memory_usage
+from csr_graph import CSRGraph
+from graph_gen import add_nodes_to_multiple_levels, create_base_schema_graph
+from graph_query import TraversalResult, demonstrate_traversal_methods
+
+# Nodes added per level in the 29-level driver at the bottom of graph_gen.py
+REFERENCE_LEVELS = {
+    3: 2000, 4: 3000, 5: 2000, 6: 1000, 7: 2000, 8: 5000, 9: 6500, 10: 4900, 11: 3500,
+    12: 1500, 13: 6000, 14: 4000, 15: 8000, 16: 2000, 17: 3000, 18: 2000, 19: 1000,
+    20: 2000, 21: 5000, 22: 6500, 23: 4900, 24: 3500, 25: 1500, 26: 6000, 27: 4000,
+    28: 8000, 29: 3000,
+}
+
+# Used when no --schema is given: a business group down to modules, as in the app
+DEFAULT_SCHEMA = {"Business Group": {"name": "Business Group (Etch)", "children": [
+    {"name": "Kiyo Product Family", "children": [
+        {"name": "Versys Kiyo", "children": [{"name": "module_a"}, {"name": "module_b"}]},
+        {"name": "Kiyo C", "children": [{"name": "module_c"}]}]},
+    {"name": "Flex Product Family", "children": [
+        {"name": "Flex GX", "children": [{"name": "module_d"}, {"name": "module_e", "connected_to": "Versys Kiyo"}]}]},
+]}}
+
+QUERY_METHODS = [
+    "Depth-First Search (DFS)",
+    "Breadth-First Search (BFS)",
+    "Shortest Path",
+    "All Simple Paths",
+    "Descendants and Ancestors",
+    "Degree Centrality",
+    "Subgraph Extraction",
+]
+
+# Fractional change in time per item above which `compare` reports a regression
+DEFAULT_THRESHOLD = 0.2
+# Phases faster than this in both runs are too noisy to flag
+DEFAULT_MIN_SECONDS = 0.05
+
+
+def scaled_levels(scale, levels):
+    """The first `levels` generated levels of REFERENCE_LEVELS, each scaled and at least one node."""
+    return {level: max(1, round(count * scale)) for level, count in list(REFERENCE_LEVELS.items())[:levels]}
+
+
+def measure(func, *args, **kwargs):
+    """Run func once; return (result, wall seconds, peak RSS in MiB)."""
+    def timed():
+        # Timed inside so memory_usage's monitor start-up is not counted
+        start = time.perf_counter()
+        result = func(*args, **kwargs)
+        return result, time.perf_counter() - start
+
+    peak, (result, seconds) = memory_usage((timed, (), {}), interval=0.01, max_usage=True, retval=True)
+    return result, seconds, peak
+
+
+def _generate(schema_json, level_node_dict, connections_per_node, jump_probability, seed):
+    G = create_base_schema_graph(schema_json)
+    return add_nodes_to_multiple_levels(G, level_node_dict, connections_per_node, jump_probability,
+                                        [0.35, 0.28, 0.21, 0.14], batched=True, seed=seed)
+
+
+def _run_queries(G, csr, method, pairs):
+    for source, target in pairs:
+        result = demonstrate_traversal_methods(G, method, source, target, max_depth=3, csr=csr, visualize=False)
+        if isinstance(result, TraversalResult):
+            # Only the first page has run so far; time the whole traversal as before
+            result.nodes(0, G.number_of_nodes())
+
+
+def benchmark_config(schema_json, config, queries, seed):
+    """Records for one configuration: generation, snapshot build and every query method."""
+    level_node_dict = scaled_levels(config["scale"], config["levels"])
+    G, seconds, peak = measure(_generate, schema_json, level_node_dict, config["connections_per_node"],
+                               config["jump_probability"], seed)
+    size = {"nodes": G.number_of_nodes(), "edges": G.number_of_edges()}
+    records = [dict(config=config, phase="generate", items=size["nodes"], unit="nodes", **size,
+                    wall_s=seconds, peak_rss_mib=peak)]
+
+    csr, seconds, peak = measure(CSRGraph.from_networkx, G)
+    records.append(dict(config=config, phase="csr", items=size["nodes"], unit="nodes", **size,
+                        wall_s=seconds, peak_rss_mib=peak))
+
+    rng = random.Random(seed)
+    nodes = list(G)
+    pairs = [(rng.choice(nodes), rng.choice(nodes)) for _ in range(queries)]
+    for method in QUERY_METHODS:
+        _, seconds, peak = measure(_run_queries, G, csr, method, pairs)
+        records.append(dict(config=config, phase=method, items=queries, unit="queries", **size,
+                            wall_s=seconds, peak_rss_mib=peak))
+
+    for record in records:
+        record["throughput"] = record["items"] / record["wall_s"] if record["wall_s"] > 0 else None
+    return records
+
+
+def run(args):
+    schema_json = open(args.schema).read() if args.schema else json.dumps(DEFAULT_SCHEMA)
+    configs = [{"scale": scale, "levels": levels, "connections_per_node": cpn, "jump_probability": jump}
+               for scale, levels, cpn, jump in itertools.product(args.scales, args.levels,
+                                                                 args.connections, args.jumps)]
+    results = []
+    for i, config in enumerate(configs, 1):
+        print(f"[{i}/{len(configs)}] {config}", file=sys.stderr)
+        results.extend(benchmark_config(schema_json, config, args.queries, args.seed))
+
+    report = {
+        "meta": {"python": platform.python_version(), "machine": platform.machine(),
+                 "created": time.strftime("%Y-%m-%dT%H:%M:%S"), "seed": args.seed, "queries": args.queries},
+        "results": results,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=1)
+    for record in results:
+        print(f"{record['phase']:<28} {record['nodes']:>8} nodes {record['wall_s']:>9.3f}s "
+              f"{record['peak_rss_mib']:>8.1f} MiB {record['throughput'] or 0:>12.1f} {record['unit']}/s")
+    return 0
+
+
+def _record_key(record):
+    return json.dumps(record["config"], sort_keys=True), record["phase"]
+
+
+def compare_reports(base, new, threshold=DEFAULT_THRESHOLD, min_seconds=DEFAULT_MIN_SECONDS):
+    """Rows of (config, phase, base s/item, new s/item, time change, RSS change MiB, regressed)."""
+    base_records = {_record_key(r): r for r in base["results"]}
+    rows = []
+    for record in new["results"]:
+        old = base_records.get(_record_key(record))
+        if old is None:
+            continue
+        old_cost = old["wall_s"] / old["items"]
+        new_cost = record["wall_s"] / record["items"]
+        change = new_cost / old_cost - 1 if old_cost > 0 else 0.0
+        rows.append((record["config"], record["phase"], old_cost, new_cost, change,
+                     record["peak_rss_mib"] - old["peak_rss_mib"],
+                     change > threshold and max(old["wall_s"], record["wall_s"]) >= min_seconds))
+    return rows
+
+
+def compare(args):
+    with open(args.base) as f:
+        base = json.load(f)
+    with open(args.new) as f:
+        new = json.load(f)
+    rows = compare_reports(base, new, args.threshold, args.min_seconds)
+    for config, phase, old_cost, new_cost, change, rss_change, regressed in rows:
+        flag = "REGRESSION" if regressed else ""
+        print(f"{phase:<28} {config['scale']:>6} x {config['levels']:>2} levels "
+              f"{old_cost * 1000:>10.3f} -> {new_cost * 1000:>10.3f} ms/item {change:>+8.1%} "
+              f"{rss_change:>+8.1f} MiB {flag}")
+    regressions = sum(row[-1] for row in rows)
+    print(f"{len(rows)} matched records, {regressions} regressions (threshold {args.threshold:.0%})")
+    return 1 if regressions else 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark graph generation and queries.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="run the benchmark sweep")
+    run_parser.add_argument("-o", "--output", default="benchmark.json")
+    run_parser.add_argument("--schema", help="schema JSON file (default: a built-in example)")
+    run_parser.add_argument("--scales", type=float, nargs="+", default=[0.01, 0.1],
+                            help="fractions of the 29-level reference node counts")
+    run_parser.add_argument("--levels", type=int, nargs="+", default=[10, 27],
+                            help="how many generated levels to use")
+    run_parser.add_argument("--connections", type=int, nargs="+", default=[1, 2])
+    run_parser.add_argument("--jumps", type=float, nargs="+", default=[0.0, 0.1])
+    run_parser.add_argument("--queries", type=int, default=20, help="queries per method")
+    run_parser.add_argument("--seed", type=int, default=0)
+    run_parser.set_defaults(func=run)
+
+    compare_parser = commands.add_parser("compare", help="flag regressions between two runs")
+    compare_parser.add_argument("base")
+    compare_parser.add_argument("new")
+    compare_parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    compare_parser.add_argument("--min-seconds", type=float, default=DEFAULT_MIN_SECONDS,
+                                help="ignore phases faster than this in both runs")
+    compare_parser.set_defaults(func=compare)
+
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
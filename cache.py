@@ -0,0 +1,111 @@
+import hashlib
+import json
+from collections import OrderedDict
+
+# Rough CPython footprint of a networkx DiGraph: a node costs entries in
+# _node/_succ/_pred plus its adjacency and attribute dicts, an edge costs
+# entries in both adjacency dicts plus its (empty) attribute dict.
+NODE_BYTES = 600
+EDGE_BYTES = 250
+
+
+def content_key(*parts):
+    """Stable hex digest of strings, bytes and JSON-serializable parameters."""
+    digest = hashlib.sha256()
+    for part in parts:
+        if isinstance(part, str):
+            part = part.encode("utf-8")
+        elif not isinstance(part, bytes):
+            part = json.dumps(part, sort_keys=True, default=str).encode("utf-8")
+        digest.update(len(part).to_bytes(8, "little"))
+        digest.update(part)
+    return digest.hexdigest()
+
+
+def graph_nbytes(G):
+    return G.number_of_nodes() * NODE_BYTES + G.number_of_edges() * EDGE_BYTES
+
+
+def csr_nbytes(csr):
+    arrays = (csr.levels, csr.indptr, csr.indices, csr.rev_indptr, csr.rev_indices)
+    return sum(a.nbytes for a in arrays) + csr.number_of_nodes() * NODE_BYTES // 3
+
+
+class LRUCache:
+    """Least-recently-used cache bounded by an estimated byte budget and/or an entry count.
+
+    Values larger than the whole budget are returned to the caller but not kept.
+    """
+
+    def __init__(self, max_bytes=None, max_entries=None):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # key -> (value, nbytes)
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def get(self, key, default=None):
+        if key in self._entries:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return self._entries[key][0]
+        self.misses += 1
+        return default
+
+    def put(self, key, value, nbytes=0):
+        if key in self._entries:
+            self.current_bytes -= self._entries.pop(key)[1]
+        if self.max_bytes is not None and nbytes > self.max_bytes:
+            return value
+        self._entries[key] = (value, nbytes)
+        self.current_bytes += nbytes
+        self._evict()
+        return value
+
+    def get_or_create(self, key, factory, sizeof=None):
+        if key in self._entries:
+            return self.get(key)
+        self.misses += 1
+        value = factory()
+        return self.put(key, value, sizeof(value) if sizeof else 0)
+
+    def discard(self, key):
+        if key in self._entries:
+            self.current_bytes -= self._entries.pop(key)[1]
+
+    def clear(self):
+        self._entries.clear()
+        self.current_bytes = 0
+
+    def resize(self, max_bytes=None, max_entries=None):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self._evict()
+
+    def _evict(self):
+        while self._entries and (
+                (self.max_bytes is not None and self.current_bytes > self.max_bytes)
+                or (self.max_entries is not None and len(self._entries) > self.max_entries)):
+            _, (_, nbytes) = self._entries.popitem(last=False)
+            self.current_bytes -= nbytes
+            self.evictions += 1
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "size_mib": round(self.current_bytes / 2**20, 2),
+            "budget_mib": None if self.max_bytes is None else round(self.max_bytes / 2**20, 2),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "evictions": self.evictions,
+        }
@@ -0,0 +1,221 @@
+import networkx as nx
+import numpy as np
+from degree_index import top_k_indices
+from graph_gen import build_level_index, get_node_type, get_root
+from node_attrs import NodeAttributeStore, add_nodes_shared, get_attribute_store
+
+
+class CSRGraph:
+    """Immutable array-backed snapshot of a directed graph for fast queries.
+
+    Nodes are numbered 0..n-1 in the graph's node order. Forward and reverse
+    adjacency are stored as CSR (indptr, indices) pairs, so traversals work
+    on integer ids and only translate back to names at the edge.
+    """
+
+    def __init__(self, names, levels, indptr, indices, rev_indptr, rev_indices, root=None, ids=None):
+        # names maps id -> name and ids name -> id; both may be lazy tables (see snapshot.py)
+        self.names = names
+        self.ids = ids if ids is not None else {name: i for i, name in enumerate(names)}
+        self.root = root
+        self.levels = levels
+        self.indptr = indptr
+        self.indices = indices
+        self.rev_indptr = rev_indptr
+        self.rev_indices = rev_indices
+        for array in (levels, indptr, indices, rev_indptr, rev_indices):
+            array.flags.writeable = False
+
+    @classmethod
+    def from_networkx(cls, G):
+        names = list(G.nodes())
+        ids = {name: i for i, name in enumerate(names)}
+        n = len(names)
+        m = G.number_of_edges()
+        id_dtype = np.int32 if n < 2**31 else np.int64
+
+        levels = get_attribute_store(G).levels.astype(np.int32)
+        src = np.fromiter((ids[u] for u, _ in G.edges()), dtype=id_dtype, count=m)
+        dst = np.fromiter((ids[v] for _, v in G.edges()), dtype=id_dtype, count=m)
+
+        # G.edges() is grouped by source in node order, so src is already sorted
+        indptr = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(src, minlength=n), out=indptr[1:])
+
+        order = np.argsort(dst, kind='stable')
+        rev_indptr = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(dst, minlength=n), out=rev_indptr[1:])
+
+        return cls(names, levels, indptr, dst, rev_indptr, src[order], root=get_root(G), ids=ids)
+
+    def to_networkx(self):
+        """Materialize a networkx DiGraph with the same attributes and level index as generation."""
+        G = nx.DiGraph()
+        names = self.to_names(np.arange(len(self.names)))
+        # Nodes share one read-only attribute mapping per level, as in generation;
+        # ids are in insertion order, so levels come in long runs
+        attributes = NodeAttributeStore(max(1024, len(names)))
+        bounds = np.flatnonzero(np.diff(self.levels)) + 1
+        for start, end in zip([0, *bounds.tolist()], [*bounds.tolist(), len(names)]):
+            level = int(self.levels[start])
+            node_type = get_node_type(level)
+            attributes.append(level, node_type, end - start)
+            add_nodes_shared(G, names[start:end], attributes.shared_attributes(level, node_type))
+        G.graph['attributes'] = attributes
+        src = np.repeat(np.arange(len(names)), self.out_degrees())
+        G.add_edges_from(zip(self.to_names(src), self.to_names(self.indices)))
+        build_level_index(G, root=self.root)
+        return G
+
+    def number_of_nodes(self):
+        return len(self.names)
+
+    def number_of_edges(self):
+        return len(self.indices)
+
+    def node_id(self, name):
+        return self.ids[name]
+
+    def to_names(self, node_ids):
+        names = self.names
+        return [names[i] for i in np.asarray(node_ids).tolist()]
+
+    def successors(self, u):
+        return self.indices[self.indptr[u]:self.indptr[u + 1]]
+
+    def predecessors(self, u):
+        return self.rev_indices[self.rev_indptr[u]:self.rev_indptr[u + 1]]
+
+    def out_degrees(self):
+        return np.diff(self.indptr)
+
+    def in_degrees(self):
+        return np.diff(self.rev_indptr)
+
+    def _adjacency(self, reverse):
+        return (self.rev_indptr, self.rev_indices) if reverse else (self.indptr, self.indices)
+
+    @staticmethod
+    def _expand(frontier, indptr, indices):
+        """Neighbours of every frontier node, in frontier then adjacency order, with their origin."""
+        starts = indptr[frontier]
+        lengths = indptr[frontier + 1] - starts
+        total = int(lengths.sum())
+        if total == 0:
+            return indices[:0], frontier[:0]
+        offsets = np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + np.arange(total)
+        return indices[offsets], np.repeat(frontier, lengths)
+
+    @staticmethod
+    def _first_unvisited(neighbours, origins, visited):
+        mask = ~visited[neighbours]
+        neighbours, origins = neighbours[mask], origins[mask]
+        _, first = np.unique(neighbours, return_index=True)
+        first.sort()
+        return neighbours[first], origins[first]
+
+    def bfs_layers(self, source, reverse=False, max_depth=None):
+        """Yield arrays of node ids by BFS depth, starting with [source]."""
+        indptr, indices = self._adjacency(reverse)
+        visited = np.zeros(len(self.names), dtype=bool)
+        frontier = np.array([source], dtype=indices.dtype)
+        visited[source] = True
+        depth = 0
+        while len(frontier):
+            yield frontier
+            if max_depth is not None and depth >= max_depth:
+                return
+            neighbours, origins = self._expand(frontier, indptr, indices)
+            frontier, _ = self._first_unvisited(neighbours, origins, visited)
+            visited[frontier] = True
+            depth += 1
+
+    def depth_limited_bfs(self, source, max_depth=None, direction="successors", max_nodes=None):
+        """Frontier BFS following successors, predecessors or both.
+
+        Each node is expanded once. Returns (ids in BFS order, their depths,
+        truncated), where truncated is True if max_nodes cut the search short.
+        """
+        adjacencies = {"successors": [self._adjacency(False)], "predecessors": [self._adjacency(True)],
+                       "both": [self._adjacency(False), self._adjacency(True)]}[direction]
+        visited = np.zeros(len(self.names), dtype=bool)
+        frontier = np.array([source], dtype=self.indices.dtype)
+        visited[source] = True
+        layers, depths, count, depth = [], [], 0, 0
+        truncated = False
+        while len(frontier):
+            if max_nodes is not None and count + len(frontier) > max_nodes:
+                frontier = frontier[:max_nodes - count]
+                truncated = True
+            layers.append(frontier)
+            depths.append(np.full(len(frontier), depth, dtype=np.int64))
+            count += len(frontier)
+            if truncated or (max_depth is not None and depth >= max_depth):
+                break
+            expanded = [self._expand(frontier, *adjacency) for adjacency in adjacencies]
+            neighbours = np.concatenate([n for n, _ in expanded])
+            origins = np.concatenate([o for _, o in expanded])
+            frontier, _ = self._first_unvisited(neighbours, origins, visited)
+            visited[frontier] = True
+            depth += 1
+        return np.concatenate(layers), np.concatenate(depths), truncated
+
+    def bfs_order(self, source, reverse=False, max_depth=None):
+        return np.concatenate(list(self.bfs_layers(source, reverse, max_depth)))
+
+    def iter_bfs(self, source, reverse=False, max_depth=None):
+        """Node ids in BFS order, expanding the next frontier only once the current one is read."""
+        for layer in self.bfs_layers(source, reverse, max_depth):
+            yield from layer.tolist()
+
+    def dfs_preorder(self, source):
+        return np.fromiter(self.iter_dfs_preorder(source), dtype=self.indices.dtype)
+
+    def iter_dfs_preorder(self, source):
+        """Node ids in DFS preorder, yielded as the search reaches them."""
+        indptr, indices = self.indptr, self.indices
+        visited = np.zeros(len(self.names), dtype=bool)
+        stack = [source]
+        while stack:
+            u = stack.pop()
+            if visited[u]:
+                continue
+            visited[u] = True
+            yield u
+            # Push in reverse so neighbours are visited in adjacency order
+            stack.extend(indices[indptr[u]:indptr[u + 1]][::-1].tolist())
+
+    def shortest_path(self, source, target):
+        """Unweighted shortest path as a list of ids; raises nx.NetworkXNoPath if none exists."""
+        if source == target:
+            return [source]
+        parent = np.full(len(self.names), -1, dtype=np.int64)
+        visited = np.zeros(len(self.names), dtype=bool)
+        visited[source] = True
+        frontier = np.array([source], dtype=self.indices.dtype)
+        while len(frontier):
+            neighbours, origins = self._expand(frontier, self.indptr, self.indices)
+            frontier, origins = self._first_unvisited(neighbours, origins, visited)
+            visited[frontier] = True
+            parent[frontier] = origins
+            if visited[target]:
+                path = [target]
+                while path[-1] != source:
+                    path.append(int(parent[path[-1]]))
+                return path[::-1]
+        raise nx.NetworkXNoPath(f"No path between {self.names[source]} and {self.names[target]}.")
+
+    def descendants(self, source):
+        return self.bfs_order(source)[1:]
+
+    def ancestors(self, source):
+        return self.bfs_order(source, reverse=True)[1:]
+
+    def degree_centrality(self):
+        n = len(self.names)
+        degrees = self.out_degrees() + self.in_degrees()
+        return degrees / (n - 1) if n > 1 else np.ones(n)
+
+    def top_k(self, scores, k):
+        """Ids of the k highest scores, ties broken by node order like a stable sort."""
+        return top_k_indices(scores, k)
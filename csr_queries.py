@@ -0,0 +1,119 @@
+"""Graph Query methods on a CSRGraph snapshot.
+
+Shared by the Graph Query page (graph_query.py) and the headless runner
+(batch_query.py), so both answer every method the same way. Functions take
+and return node ids and plain numbers; callers translate names, format the
+result and draw. Nothing here imports matplotlib or Streamlit.
+"""
+from itertools import islice
+import networkx as nx
+import numpy as np
+from analytics import DEFAULT_SAMPLES, approximate_betweenness, core_numbers, pagerank
+from csr_graph import CSRGraph
+from degree_index import degree_scores, top_degree_centrality, top_k_indices
+from multi_source import iter_multi_source_bfs
+from path_count import LIST_LIMIT, PATH_COUNT_BUDGET, count_paths
+from reachability import reachability_index
+from shortest_path import shortest_path_engine
+
+TRAVERSAL_METHODS = ["Depth-First Search (DFS)", "Breadth-First Search (BFS)"]
+ANALYTICS_METHODS = ["PageRank", "Approximate Betweenness", "K-Core Decomposition"]
+
+
+def iter_visit_order(csr, method, source):
+    """Lazy DFS preorder or BFS order of node ids from source."""
+    return (csr.iter_dfs_preorder if method == "Depth-First Search (DFS)" else csr.iter_bfs)(source)
+
+
+def visit_order(csr, method, source):
+    """The whole DFS preorder or BFS order from source as an id array."""
+    return (csr.dfs_preorder if method == "Depth-First Search (DFS)" else csr.bfs_order)(source)
+
+
+def shortest_path(csr, source, target, path_engine="landmark"):
+    """(path as a list of ids or None, nodes expanded or None when the engine does not report it).
+
+    The "networkx" engine has no graph to run on here; plain BFS on the
+    snapshot finds a path of the same length.
+    """
+    if path_engine == "networkx":
+        try:
+            return csr.shortest_path(source, target), None
+        except nx.NetworkXNoPath:
+            return None, None
+    return shortest_path_engine(csr).query(source, target, use_landmarks=path_engine == "landmark")
+
+
+def simple_paths(csr, source, target, cutoff=5, time_budget=PATH_COUNT_BUDGET):
+    """count_paths with one example path (see path_count.py)."""
+    return count_paths(csr, source, target, cutoff=cutoff, examples=1, time_budget=time_budget)
+
+
+def descendants_and_ancestors(csr, source, limit=LIST_LIMIT):
+    """Counts from the reachability index, and up to `limit` ids of each, enumerated lazily."""
+    index = reachability_index(csr)
+    return {"descendant_count": index.descendant_count(source),
+            "ancestor_count": index.ancestor_count(source),
+            "descendants": list(islice(index.iter_descendants(source), limit)),
+            "ancestors": list(islice(index.iter_ancestors(source), limit))}
+
+
+def degree_centrality(csr, kind="total", level=None, k=20):
+    """(ids, centralities) of the k most central nodes by `kind` degree, optionally on one level."""
+    return top_degree_centrality(degree_scores(csr.in_degrees(), csr.out_degrees(), kind), csr.levels, level, k)
+
+
+def edges_within(csr, ids):
+    """Number of edges with both ends in `ids`."""
+    inside = np.zeros(csr.number_of_nodes(), dtype=bool)
+    inside[ids] = True
+    heads, _ = CSRGraph._expand(np.asarray(ids), csr.indptr, csr.indices)
+    return int(inside[heads].sum())
+
+
+def level_reachability(csr, level=None, max_depth=None, direction="successors", k=10):
+    """How much of the graph each node on `level` (default: the lowest) reaches, by batched BFS.
+
+    Returns a dict with the level, the source ids, per-source reached counts
+    (excluding the source) and farthest hop, the number of nodes reached from
+    any source, and the k sources reaching the most as (id, count) pairs.
+    """
+    level = int(csr.levels.min()) if level is None else level
+    sources = np.flatnonzero(csr.levels == level)
+    reached = np.zeros(len(sources), dtype=np.int64)
+    farthest = np.zeros(len(sources), dtype=np.int64)
+    reached_by_any = np.zeros(csr.number_of_nodes(), dtype=bool)
+    for start, distances in iter_multi_source_bfs(csr, sources, max_depth, direction):
+        hit = distances >= 0
+        reached[start:start + len(distances)] = hit.sum(axis=1) - 1
+        farthest[start:start + len(distances)] = distances.max(axis=1)
+        reached_by_any |= hit.any(axis=0)
+    top = [(int(sources[i]), int(reached[i])) for i in top_k_indices(reached, k).tolist()]
+    return {"level": level, "sources": sources, "reached": reached, "farthest": farthest,
+            "reached_by_any": int(reached_by_any.sum()), "top": top}
+
+
+def top_scores(csr, scores, level=None, k=20):
+    """The k best (id, score) pairs, optionally among the nodes on one level."""
+    ids = np.arange(len(scores)) if level is None else np.flatnonzero(csr.levels == level)
+    top = ids[top_k_indices(scores[ids], k)]
+    return list(zip(top.tolist(), scores[top].tolist()))
+
+
+def analytics(csr, method, level=None, samples=DEFAULT_SAMPLES, workers=None, k=20):
+    """One of ANALYTICS_METHODS, with its k best nodes (on `level`, if given) as (id, score) pairs.
+
+    The dict also carries "iterations" for PageRank, "samples" and
+    "error_bound" for betweenness, and "nodes_per_core" for k-cores.
+    """
+    if method == "PageRank":
+        scores, iterations = pagerank(csr)
+        return {"top": top_scores(csr, scores, level, k), "iterations": iterations}
+    if method == "Approximate Betweenness":
+        scores, used, error = approximate_betweenness(csr, samples, workers=workers)
+        return {"top": top_scores(csr, scores, level, k), "samples": used, "error_bound": error}
+    if method == "K-Core Decomposition":
+        cores = core_numbers(csr)
+        sizes = {core: size for core, size in enumerate(np.bincount(cores).tolist()) if size}
+        return {"top": top_scores(csr, cores, level, k), "nodes_per_core": sizes}
+    raise ValueError(f"Unknown analytics method: {method}")
@@ -0,0 +1,148 @@
+import numpy as np
+from graph_index import store_graph_index
+
+DEGREE_KINDS = ["total", "in", "out"]
+
+
+def top_k_indices(scores, k):
+    """Indices of the k largest scores, ties broken by lower index like a stable descending sort."""
+    n = len(scores)
+    if k >= n:
+        return np.argsort(-scores, kind='stable')
+    if k <= 0:
+        return np.zeros(0, dtype=np.int64)
+    threshold = np.partition(scores, n - k)[n - k]
+    above = np.flatnonzero(scores > threshold)
+    ties = np.flatnonzero(scores == threshold)[:k - len(above)]
+    chosen = np.concatenate([above, ties])
+    return chosen[np.argsort(-scores[chosen], kind='stable')]
+
+
+def degree_scores(in_degree, out_degree, kind="total"):
+    """Per-node degrees of one of DEGREE_KINDS."""
+    if kind == "in":
+        return in_degree
+    if kind == "out":
+        return out_degree
+    if kind == "total":
+        return in_degree + out_degree
+    raise ValueError(f"Unknown degree kind: {kind}")
+
+
+def top_degree_centrality(scores, levels=None, level=None, k=20):
+    """(ids, centralities) of the k highest-degree nodes, optionally among those on one level.
+
+    Centrality is degree / (n - 1), as in nx.degree_centrality.
+    """
+    n = len(scores)
+    scale = 1 / (n - 1) if n > 1 else 1.0
+    if level is None:
+        top = top_k_indices(scores, k)
+    else:
+        candidates = np.flatnonzero(levels == level)
+        top = candidates[top_k_indices(scores[candidates], k)]
+    return top, scores[top] * scale
+
+
+class DegreeIndex:
+    """In/out-degree counters kept up to date while a graph is generated.
+
+    Node ids follow insertion order (the same numbering as CSRGraph), and the
+    arrays grow by doubling, so adding a level costs O(nodes + edges) and a
+    top-k query is one argpartition instead of a full sort.
+    """
+
+    def __init__(self, capacity=1024):
+        self.ids = {}
+        self.names = []
+        self._in = np.zeros(capacity, dtype=np.int64)
+        self._out = np.zeros(capacity, dtype=np.int64)
+
+    @classmethod
+    def from_graph(cls, G):
+        index = cls(max(1024, G.number_of_nodes()))
+        index.add_nodes(list(G))
+        n = len(index.names)
+        index._in[:n] = [d for _, d in G.in_degree()]
+        index._out[:n] = [d for _, d in G.out_degree()]
+        return index
+
+    def copy(self):
+        index = DegreeIndex(len(self._in))
+        index.ids = dict(self.ids)
+        index.names = list(self.names)
+        index._in[:] = self._in
+        index._out[:] = self._out
+        return index
+
+    def __len__(self):
+        return len(self.names)
+
+    @property
+    def in_degree(self):
+        return self._in[:len(self.names)]
+
+    @property
+    def out_degree(self):
+        return self._out[:len(self.names)]
+
+    def number_of_edges(self):
+        return int(self.in_degree.sum())
+
+    def _reserve(self, size):
+        if size <= len(self._in):
+            return
+        capacity = max(size, 2 * len(self._in))
+        for attr in ('_in', '_out'):
+            grown = np.zeros(capacity, dtype=getattr(self, attr).dtype)
+            grown[:len(self.names)] = getattr(self, attr)[:len(self.names)]
+            setattr(self, attr, grown)
+
+    def add_nodes(self, names):
+        """Register new nodes and return the id of the first one."""
+        first = len(self.names)
+        self._reserve(first + len(names))
+        self.ids.update(zip(names, range(first, first + len(names))))
+        self.names.extend(names)
+        return first
+
+    def add_edges(self, src_ids, dst_ids):
+        """Count new edges given as id arrays; callers must not pass edges that already exist."""
+        np.add.at(self._out, src_ids, 1)
+        np.add.at(self._in, dst_ids, 1)
+
+    def add_edge(self, u, v):
+        self._out[self.ids[u]] += 1
+        self._in[self.ids[v]] += 1
+
+    def remove_edges(self, src_ids, dst_ids):
+        np.subtract.at(self._out, src_ids, 1)
+        np.subtract.at(self._in, dst_ids, 1)
+
+    def truncate(self, size):
+        """Forget nodes with id >= size; edges touching them must be removed first."""
+        for name in self.names[size:]:
+            del self.ids[name]
+        del self.names[size:]
+        for array in (self._in, self._out):
+            array[size:] = 0
+
+    def degrees(self, kind="total"):
+        return degree_scores(self.in_degree, self.out_degree, kind)
+
+    def top_k(self, k, kind="total", level=None, levels=None):
+        """[(name, centrality)] for the k most central nodes, optionally within one level.
+
+        Levels are not kept here: pass the per-node `levels` of the graph's
+        NodeAttributeStore along with `level`.
+        """
+        top, centrality = top_degree_centrality(self.degrees(kind), levels, level, k)
+        return [(self.names[i], c) for i, c in zip(top.tolist(), centrality)]
+
+
+def get_degree_index(G):
+    """The DegreeIndex kept in G.graph['degrees'], rebuilt if missing or out of date."""
+    index = G.graph.get('degrees')
+    if index is not None and len(index) == G.number_of_nodes() and index.number_of_edges() == G.number_of_edges():
+        return index
+    return store_graph_index(G, 'degrees', DegreeIndex.from_graph(G))
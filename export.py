@@ -0,0 +1,105 @@
+import gzip
+import json
+import os
+import tempfile
+from itertools import islice
+import networkx as nx
+from profiling import span
+
+EXPORT_FORMATS = {
+    "JSON": (".json", "application/json"),
+    "NDJSON": (".ndjson", "application/x-ndjson"),
+}
+
+_dumps = json.JSONEncoder(separators=(",", ":")).encode
+
+
+def iter_graph_json(G, fmt="JSON", chunk_size=10000):
+    """Yield the serialized graph as text chunks without building the whole document.
+
+    "JSON" produces the same {"nodes": [[id, attrs], ...], "edges": [[u, v, attrs], ...]}
+    document as before, only compact. "NDJSON" writes one node or edge object per line.
+    """
+    if fmt == "JSON":
+        nodes = (_dumps([n, d]) for n, d in G.nodes(data=True))
+        edges = (_dumps([u, v, d]) for u, v, d in G.edges(data=True))
+        yield '{"nodes":['
+        yield from _join_chunks(nodes, ",", chunk_size)
+        yield '],"edges":['
+        yield from _join_chunks(edges, ",", chunk_size)
+        yield ']}'
+    elif fmt == "NDJSON":
+        nodes = (_dumps({"kind": "node", "id": n, "data": d}) for n, d in G.nodes(data=True))
+        edges = (_dumps({"kind": "edge", "source": u, "target": v, "data": d}) for u, v, d in G.edges(data=True))
+        for lines in (nodes, edges):
+            for chunk in _join_chunks(lines, "\n", chunk_size):
+                yield chunk + "\n"
+    else:
+        raise ValueError(f"Unknown export format: {fmt}")
+
+
+def _join_chunks(items, separator, chunk_size):
+    first = True
+    while True:
+        chunk = list(islice(items, chunk_size))
+        if not chunk:
+            return
+        text = separator.join(chunk)
+        yield text if first or separator == "\n" else separator + text
+        first = False
+
+
+def write_graph_json(G, fileobj, fmt="JSON", chunk_size=10000):
+    for chunk in iter_graph_json(G, fmt, chunk_size):
+        fileobj.write(chunk.encode("utf-8"))
+
+
+def export_graph(G, fmt="JSON", compress=False, path=None):
+    """Stream G to `path` (a new temp file if None) and return the path; gzip-compressed when compress is set."""
+    if path is None:
+        fd, path = tempfile.mkstemp(prefix="graph_export_", suffix=export_filename(fmt, compress, ""))
+        os.close(fd)
+    with span(f"export {fmt}", "serialization", compressed=compress), open(path, "wb") as raw:
+        if compress:
+            with gzip.GzipFile(fileobj=raw, mode="wb", compresslevel=6) as f:
+                write_graph_json(G, f, fmt)
+        else:
+            write_graph_json(G, raw, fmt)
+    return path
+
+
+def read_graph_json(path):
+    """Load a graph written by export_graph, in either format and optionally gzip-compressed."""
+    opener = gzip.open if path.endswith(".gz") else open
+    G = nx.DiGraph()
+    with opener(path, "rt", encoding="utf-8") as f:
+        if path.removesuffix(".gz").endswith(EXPORT_FORMATS["NDJSON"][0]):
+            for line in f:
+                item = json.loads(line)
+                if item["kind"] == "node":
+                    G.add_node(item["id"], **item["data"])
+                else:
+                    G.add_edge(item["source"], item["target"], **item["data"])
+        else:
+            document = json.load(f)
+            G.add_nodes_from((n, d) for n, d in document["nodes"])
+            G.add_edges_from((u, v, d) for u, v, d in document["edges"])
+    return G
+
+
+def export_filename(fmt, compress=False, stem="generated_graph"):
+    return stem + EXPORT_FORMATS[fmt][0] + (".gz" if compress else "")
+
+
+def export_mime(fmt, compress=False):
+    return "application/gzip" if compress else EXPORT_FORMATS[fmt][1]
+
+
+def graph_preview(G, limit=20):
+    """First `limit` nodes and edges plus totals, for display instead of the full document."""
+    return {
+        "total_nodes": G.number_of_nodes(),
+        "total_edges": G.number_of_edges(),
+        "nodes": [[n, d] for n, d in islice(G.nodes(data=True), limit)],
+        "edges": [[u, v, d] for u, v, d in islice(G.edges(data=True), limit)],
+    }
@@ -1,30 +1,160 @@
-import json
 import networkx as nx
+import numpy as np
 import random
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from degree_index import DegreeIndex, get_degree_index
+from graph_index import store_graph_index
+from node_attrs import NodeAttributeStore, add_nodes_shared, get_attribute_store, share_node_attributes
+from profiling import span
+from schema_stream import DEFAULT_CHUNK_SIZE, iter_json_events
 
 
-def create_base_schema_graph(json_data):
-    data = json.loads(json_data)
+SCHEMA_BATCH_SIZE = 10000
+
+
+class _SchemaNode:
+    """A schema object whose closing brace has not been read yet."""
+    __slots__ = ("name", "level", "parent", "children", "links")
+
+    def __init__(self, level, parent=None):
+        self.name = None
+        self.level = level
+        self.parent = parent
+        # Children and cross-links seen before this node's own name
+        self.children = []
+        self.links = []
+
+
+def load_schema_graph(source, chunk_size=DEFAULT_CHUNK_SIZE, batch_size=SCHEMA_BATCH_SIZE):
+    """Build the base graph from the 'Business Group' tree of a schema document.
+
+    `source` is the JSON as a str/bytes or a file object. The document is
+    parsed incrementally and walked with an explicit stack, so neither the
+    parsed tree nor the call stack grows with the schema: memory is the graph
+    plus the chain of open objects. Nodes and edges are inserted in batches,
+    and `connected_to` links are added in a final pass once every node exists.
+    """
     G = nx.DiGraph()
+    nodes, edges, links = [], [], []
+    roots = []
 
-    def add_nodes_recursively(node, parent=None, level=0):
-        node_id = node['name']
-        G.add_node(node_id, level=level, node_type=get_node_type(level))
-        
-        if parent:
-            G.add_edge(parent, node_id)
-        
-        if 'connected_to' in node:
-            G.add_edge(node_id, node['connected_to'])
-        
-        if 'children' in node:
-            for child in node['children']:
-                add_nodes_recursively(child, node_id, level + 1)
+    def flush():
+        G.add_nodes_from(nodes)
+        G.add_edges_from(edges)
+        nodes.clear()
+        edges.clear()
 
-    add_nodes_recursively(data['Business Group'])
-    
+    def name_node(node, name):
+        node.name = name
+        nodes.append((name, {'level': node.level, 'node_type': get_node_type(node.level)}))
+        parent = node.parent
+        if parent is None:
+            roots.append(name)
+        elif parent.name is not None:
+            edges.append((parent.name, name))
+        else:
+            parent.children.append(name)
+        edges.extend((name, child) for child in node.children)
+        links.extend((name, target) for target in node.links)
+        node.children = node.links = None
+        if len(nodes) + len(edges) >= batch_size:
+            flush()
+
+    events = iter_json_events(source, chunk_size)
+    if next(events, (None, None))[0] != "start_map":
+        raise ValueError("Schema must be a JSON object")
+    # (context, node) per open container: "document", "node", "children" or "skip"
+    stack = [("document", None)]
+    key = None
+    skip_depth = 0
+    with span("schema: stream ingest", "generation"):
+        for kind, value in events:
+            context, node = stack[-1]
+            if context == "skip":
+                if kind in ("start_map", "start_array"):
+                    skip_depth += 1
+                elif kind in ("end_map", "end_array"):
+                    skip_depth -= 1
+                    if not skip_depth:
+                        stack.pop()
+                continue
+            if kind == "key":
+                key = value
+            elif kind in ("end_map", "end_array"):
+                if context == "node" and node.name is None:
+                    raise ValueError(f"Schema node at level {node.level} has no 'name'")
+                stack.pop()
+            elif context == "children":
+                if kind != "start_map":
+                    raise ValueError(f"Children of {node.name or 'a schema node'} must be objects")
+                stack.append(("node", _SchemaNode(node.level + 1, node)))
+            elif context == "document" and key == "Business Group" and kind == "start_map":
+                stack.append(("node", _SchemaNode(0)))
+            elif context == "node" and key == "name" and kind == "value":
+                name_node(node, value)
+            elif context == "node" and key == "connected_to" and kind == "value" and value is not None:
+                if node.name is None:
+                    node.links.append(value)
+                else:
+                    links.append((node.name, value))
+            elif context == "node" and key == "children" and kind == "start_array":
+                stack.append(("children", node))
+            elif kind in ("start_map", "start_array"):
+                stack.append(("skip", None))
+                skip_depth = 1
+        flush()
+    if not roots:
+        raise ValueError("Schema has no 'Business Group'")
+
+    with span("schema: cross-links", "generation"):
+        G.add_edges_from(links)
+    with span("schema: indexes", "generation"):
+        build_level_index(G, root=roots[0])
+        G.graph['degrees'] = DegreeIndex.from_graph(G)
+        G.graph['attributes'] = NodeAttributeStore.from_graph(G)
     return G
 
+def create_base_schema_graph(json_data):
+    return load_schema_graph(json_data)
+
+def build_level_index(G, root=None):
+    """Group node names by their 'level' attribute and remember the root.
+
+    The index lives in G.graph['level_index'] (level -> list of nodes) and
+    G.graph['root'], so it travels with the graph and is extended in place
+    as levels are added.
+    """
+    level_index = {}
+    for node, level in G.nodes(data='level', default=0):
+        level_index.setdefault(level, []).append(node)
+
+    if root is None:
+        root = next((n for n, d in G.in_degree() if d == 0), None)
+
+    store_graph_index(G, 'root', root)
+    return store_graph_index(G, 'level_index', level_index)
+
+def get_level_index(G):
+    level_index = G.graph.get('level_index')
+    if level_index is not None and sum(len(nodes) for nodes in level_index.values()) == G.number_of_nodes():
+        return level_index
+    return build_level_index(G)
+
+def copy_graph(G):
+    """Copy G with its own level, degree and attribute indexes, so generating into the copy leaves G untouched."""
+    H = G.copy()
+    # G.copy() gives every node a dict again; the shared read-only ones are safe to reuse
+    share_node_attributes(G, H)
+    H.graph['level_index'] = {level: list(nodes) for level, nodes in get_level_index(G).items()}
+    H.graph['degrees'] = get_degree_index(G).copy()
+    H.graph['attributes'] = get_attribute_store(G).copy()
+    return H
+
+def get_root(G):
+    get_level_index(G)
+    return G.graph.get('root')
+
 def get_node_type(level):
     node_types = {
         0: "business_group",
@@ -36,58 +166,326 @@ def get_node_type(level):
     
     return node_types.get(level, f"level_{level}")
 
-def custom_kernel(degree, probability_distribution):
+def kernel_bucket(degree):
     if degree == 0:
-        return probability_distribution[0]
+        return 0
     elif degree < 3:
-        return probability_distribution[1]
+        return 1
     elif degree < 5:
-        return probability_distribution[2]
+        return 2
     else:
-        return probability_distribution[3]
+        return 3
 
-def add_nodes_to_multiple_levels(G, level_node_dict, connections_per_node=1, jump_probability=0, probability_distribution=[1.0, 0.8, 0.6, 0.4]):
-    root_node = [n for n in G.nodes() if G.in_degree(n) == 0][0]  # Assume the root is the only node with in_degree 0
-    
-    # Determine the starting level
-    start_level = max(data.get('level', 0) for _, data in G.nodes(data=True)) + 1
+def custom_kernel(degree, probability_distribution):
+    return probability_distribution[kernel_bucket(degree)]
 
-    for level_number, num_nodes in level_node_dict.items():
-        # Adjust the level number to start from the next available level
-        adjusted_level = start_level + level_number - min(level_node_dict.keys())
-        
-        # Generate new nodes
-        new_nodes = nx.gn_graph(num_nodes, kernel=lambda x: custom_kernel(x, probability_distribution))
-        
-        # Add new nodes to the main graph
+def bucketed_gn_edges(n, probability_distribution, rng=random):
+    """Edges of a growing network drawn with the same law as nx.gn_graph + custom_kernel.
+
+    custom_kernel only has four degree buckets, so nodes are kept grouped by
+    bucket and each attachment picks a bucket by its total weight and then a
+    uniform member of it: O(1) per node instead of O(n).
+    """
+    if n < 2:
+        return []
+
+    weights = [float(w) for w in probability_distribution]
+    buckets = [[], [0, 1], [], []]
+    position = [0, 1]  # index of each node inside its bucket
+    degree = [1, 1]
+    edges = [(1, 0)]
+
+    for source in range(2, n):
+        totals = [weights[b] * len(buckets[b]) for b in range(4)]
+        total = sum(totals)
+        if total <= 0:
+            raise ValueError("probability_distribution gives zero weight to every existing node")
+
+        # One draw picks both the bucket and the member inside it
+        r = rng.random() * total
+        chosen = max(b for b in range(4) if totals[b] > 0)
+        for b in range(4):
+            if r < totals[b]:
+                chosen = b
+                break
+            r -= totals[b]
+        members = buckets[chosen]
+        target = members[min(int(r / weights[chosen]), len(members) - 1)]
+        edges.append((source, target))
+
+        degree[target] += 1
+        new_bucket = kernel_bucket(degree[target])
+        if new_bucket != chosen:
+            last = members.pop()
+            if last != target:
+                members[position[target]] = last
+                position[last] = position[target]
+            position[target] = len(buckets[new_bucket])
+            buckets[new_bucket].append(target)
+
+        degree.append(1)
+        position.append(len(buckets[1]))
+        buckets[1].append(source)
+
+    return edges
+
+def generate_level_edges(num_nodes, probability_distribution, engine="bucketed", rng=random):
+    if engine == "bucketed":
+        return bucketed_gn_edges(num_nodes, probability_distribution, rng)
+    elif engine == "networkx":
+        # Reference implementation, O(n^2) kernel calls per level
+        new_nodes = nx.gn_graph(num_nodes, kernel=lambda x: custom_kernel(x, probability_distribution),
+                                seed=None if rng is random else rng)
+        return list(new_nodes.edges())
+    raise ValueError(f"Unknown generation engine: {engine}")
+
+def level_seeds(master_seed, num_levels):
+    """Independent, reproducible per-level seeds spawned from one master seed."""
+    children = np.random.SeedSequence(master_seed).spawn(num_levels)
+    return [int(child.generate_state(1, np.uint64)[0]) for child in children]
+
+def build_level_seeded(num_nodes, probability_distribution, engine, level_seed, wiring_plan=None):
+    """A level's GN edges as an (n-1, 2) array, plus its drawn wiring when wiring_plan is given.
+
+    Runs in a worker process: arrays pickle far smaller than tuples. Parent
+    picks and jumps draw from a numpy stream on the same per-level seed.
+    """
+    edges = generate_level_edges(num_nodes, probability_distribution, engine, random.Random(level_seed))
+    gn = np.array(edges, dtype=np.int64).reshape(-1, 2)
+    if wiring_plan is None:
+        return gn.tolist(), None
+    return gn, draw_level_wiring(np.random.default_rng(level_seed), num_nodes, gn, *wiring_plan)
+
+# Worker pools by size, kept between runs so a generation does not pay for starting processes
+_pools = {}
+_pools_lock = threading.Lock()
+
+def level_pool(workers):
+    with _pools_lock:
+        pool = _pools.get(workers)
+        if pool is None:
+            pool = _pools[workers] = ProcessPoolExecutor(max_workers=workers)
+        return pool
+
+def iter_level_edges(level_node_dict, probability_distribution, engine, rng, workers, wiring_plans=None):
+    """Yield (gn_edges, wiring) for each level in level order.
+
+    With workers=None the levels draw from rng one after another and wiring
+    is None. Otherwise every level gets its own seeded stream and is built in
+    a process pool of `workers` processes, so the result depends only on the
+    seed, never on the worker count or on scheduling. A level's wiring_plans
+    entry (see draw_level_wiring) has its parent picks and jumps drawn there
+    too, leaving only insertion to the caller.
+    """
+    sizes = list(level_node_dict.values())
+    if workers is None:
+        for num_nodes in sizes:
+            yield generate_level_edges(num_nodes, probability_distribution, engine, rng), None
+        return
+
+    seeds = level_seeds(rng.getrandbits(64), len(sizes))
+    plans = wiring_plans or [None] * len(sizes)
+    if workers <= 1:
+        for num_nodes, level_seed, plan in zip(sizes, seeds, plans):
+            yield build_level_seeded(num_nodes, probability_distribution, engine, level_seed, plan)
+        return
+
+    pool = level_pool(workers)
+    futures = [pool.submit(build_level_seeded, num_nodes, probability_distribution, engine, level_seed, plan)
+               for num_nodes, level_seed, plan in zip(sizes, seeds, plans)]
+    try:
+        # Yielding in submission order lets merging level i overlap building later levels
+        for future in futures:
+            yield future.result()
+    finally:
+        # Also reached when the consumer stops early (e.g. a cancelled run): drop levels not yet started
+        for future in futures:
+            future.cancel()
+
+def sample_parents(rng, num_parents, num_nodes, k):
+    """Draw k distinct parent indices for each of num_nodes nodes as a (num_nodes, k) array."""
+    if k >= num_parents:
+        return np.tile(np.arange(num_parents), (num_nodes, 1))
+    if 2 * k > num_parents:
+        # Dense case: a random permutation per row is cheaper than rejection
+        return np.argsort(rng.random((num_nodes, num_parents)), axis=1)[:, :k]
+
+    picks = rng.integers(0, num_parents, size=(num_nodes, k))
+    while k > 1:
+        ordered = np.sort(picks, axis=1)
+        duplicated = (ordered[:, 1:] == ordered[:, :-1]).any(axis=1)
+        if not duplicated.any():
+            break
+        picks[duplicated] = rng.integers(0, num_parents, size=(int(duplicated.sum()), k))
+    return picks
+
+def draw_level_wiring(rng, num_nodes, gn, num_parents, connections_per_node, first_id, jump_probability):
+    """Draw a batched level's parent picks and jump edges.
+
+    Needs only counts, since the level's ids are first_id.. and jump targets
+    range over every node up to the level's last: (parents, jump_sources,
+    jump_targets), where parents indexes the parent level (None if it is
+    empty). Jumps skip self-loops and repeats of a node's GN edge.
+    """
+    parents = None
+    if num_parents:
+        parents = sample_parents(rng, num_parents, num_nodes, min(connections_per_node, num_parents))
+    jump_sources = jump_targets = np.zeros(0, dtype=np.int64)
+    if jump_probability > 0:
+        new_ids = np.arange(first_id, first_id + num_nodes)
+        gn_target = np.full(num_nodes, -1, dtype=np.int64)
+        gn_target[gn[:, 0]] = gn[:, 1] + first_id
+        jumpers = np.flatnonzero(rng.random(num_nodes) < jump_probability)
+        jump_targets = rng.integers(0, first_id + num_nodes, size=len(jumpers))
+        keep = (jump_targets != new_ids[jumpers]) & (jump_targets != gn_target[jumpers])
+        jump_sources, jump_targets = new_ids[jumpers[keep]], jump_targets[keep]
+    return parents, jump_sources, jump_targets
+
+def add_level_batched(G, rng, adjusted_level, num_nodes, new_edges, parent_level_nodes, root_node, degrees,
+                      attributes, connections_per_node, jump_probability, wiring=None):
+    # Edges are assembled as id arrays (ids follow insertion order, see DegreeIndex),
+    # so degree counters update in bulk and names are only looked up at insertion
+    first_id = len(G)
+    with span("insert nodes", "generation"):
+        new_names = [f"level_{adjusted_level}_{first_id + i}" for i in range(num_nodes)]
+        # Every node on the level shares one read-only attribute mapping
+        node_type = get_node_type(adjusted_level)
+        attributes.append(adjusted_level, node_type, num_nodes)
+        add_nodes_shared(G, new_names, attributes.shared_attributes(adjusted_level, node_type))
+        degrees.add_nodes(new_names)
+    new_ids = np.arange(first_id, first_id + num_nodes)
+    gn = np.asarray(new_edges, dtype=np.int64).reshape(-1, 2)
+
+    if wiring is None:
+        with span("draw wiring", "generation"):
+            wiring = draw_level_wiring(rng, num_nodes, gn, len(parent_level_nodes), connections_per_node,
+                                       first_id, jump_probability)
+    parents, jump_sources, jump_targets = wiring
+
+    # Connect to parent level, then add the GN edges between new nodes and the jumps
+    with span("parent wiring", "generation"):
+        if parents is not None:
+            parent_ids = np.fromiter((degrees.ids[p] for p in parent_level_nodes), dtype=np.int64,
+                                     count=len(parent_level_nodes))
+            sources = [parent_ids[parents.ravel()]]
+            targets = [np.repeat(new_ids, parents.shape[1])]
+        else:
+            sources = [np.array([degrees.ids[root_node]])]
+            targets = [new_ids[:1]]
+    sources += [gn[:, 0] + first_id, jump_sources]
+    targets += [gn[:, 1] + first_id, jump_targets]
+
+    with span("insert edges", "generation"):
+        src, dst = np.concatenate(sources), np.concatenate(targets)
+        degrees.add_edges(src, dst)
+        names = degrees.names
+        G.add_edges_from(zip(map(names.__getitem__, src.tolist()), map(names.__getitem__, dst.tolist())))
+    return new_names
+
+def add_counted_edge(G, degrees, u, v):
+    if not G.has_edge(u, v):
+        G.add_edge(u, v)
+        degrees.add_edge(u, v)
+
+def add_level(G, rng, np_rng, level_edges, level_index, adjusted_level, num_nodes, root_node, degrees,
+              attributes, connections_per_node, jump_probability, batched):
+    with span("generate level edges", "generation"):
+        # level_edges is lazy, so this is where a level's GN structure is built (or awaited)
+        new_edges, wiring = next(level_edges)
+
+    if batched:
+        parent_level_nodes = level_index.get(adjusted_level - 1, [])
+        new_names = add_level_batched(G, np_rng, adjusted_level, num_nodes, new_edges, parent_level_nodes, root_node,
+                                      degrees, attributes, connections_per_node, jump_probability, wiring)
+        level_index.setdefault(adjusted_level, []).extend(new_names)
+        return
+    
+    # Add new nodes to the main graph
+    with span("insert nodes", "generation"):
+        node_type = get_node_type(adjusted_level)
+        shared = attributes.shared_attributes(adjusted_level, node_type)
         node_mapping = {}
-        for node in new_nodes.nodes():
+        for node in range(num_nodes):
             new_node_name = f"level_{adjusted_level}_{len(G.nodes())}"
-            G.add_node(new_node_name, level=adjusted_level, node_type=get_node_type(adjusted_level))
+            add_nodes_shared(G, [new_node_name], shared)
+            attributes.append(adjusted_level, node_type)
+            degrees.add_nodes([new_node_name])
             node_mapping[node] = new_node_name
         
-        # Connect to parent level
-        parent_level_nodes = [n for n in G.nodes() if G.nodes[n].get('level', 0) == adjusted_level - 1]
+        level_index.setdefault(adjusted_level, []).extend(node_mapping.values())
+    
+    # Connect to parent level
+    with span("parent wiring", "generation"):
+        parent_level_nodes = level_index.get(adjusted_level - 1, [])
         if parent_level_nodes:
             for new_node in node_mapping.values():
-                parents = random.sample(parent_level_nodes, min(connections_per_node, len(parent_level_nodes)))
+                parents = rng.sample(parent_level_nodes, min(connections_per_node, len(parent_level_nodes)))
                 for parent in parents:
-                    G.add_edge(parent, new_node)
+                    add_counted_edge(G, degrees, parent, new_node)
         else:
-            G.add_edge(root_node, list(node_mapping.values())[0])
-        
-        # Add edges between new nodes based on the generated graph
-        for edge in new_nodes.edges():
-            G.add_edge(node_mapping[edge[0]], node_mapping[edge[1]])
-        
-        # Add jumps between levels
-        if jump_probability > 0:
+            add_counted_edge(G, degrees, root_node, list(node_mapping.values())[0])
+    
+    # Add edges between new nodes based on the generated graph
+    with span("insert edges", "generation"):
+        for edge in new_edges:
+            add_counted_edge(G, degrees, node_mapping[edge[0]], node_mapping[edge[1]])
+    
+    # Add jumps between levels
+    if jump_probability > 0:
+        with span("jump edges", "generation"):
             all_nodes = list(G.nodes())
             for new_node in node_mapping.values():
-                if random.random() < jump_probability:
-                    jump_target = random.choice(all_nodes)
+                if rng.random() < jump_probability:
+                    jump_target = rng.choice(all_nodes)
                     if jump_target != new_node:
-                        G.add_edge(new_node, jump_target)
+                        add_counted_edge(G, degrees, new_node, jump_target)
+
+def add_nodes_to_multiple_levels(G, level_node_dict, connections_per_node=1, jump_probability=0, probability_distribution=[1.0, 0.8, 0.6, 0.4], engine="bucketed", batched=False, seed=None, workers=None, progress=None):
+    # A seed gives the run its own random stream; otherwise the global random module is used.
+    # progress, if given, is called with a dict after each level; an exception it raises stops the run.
+    rng = random if seed is None else random.Random(seed)
+    level_index = get_level_index(G)
+    root_node = G.graph['root']
+    
+    # Determine the starting level
+    start_level = max(level_index) + 1
+
+    wiring_plans = None
+    if batched and workers is not None:
+        # Batched levels get contiguous ids and their sizes are known up front,
+        # so the workers can draw parent picks and jumps as well as GN edges
+        wiring_plans, sizes, first_id = [], {}, len(G)
+        for level_number, num_nodes in level_node_dict.items():
+            adjusted_level = start_level + level_number - min(level_node_dict.keys())
+            num_parents = sizes.get(adjusted_level - 1, len(level_index.get(adjusted_level - 1, [])))
+            wiring_plans.append((num_parents, connections_per_node, first_id, jump_probability))
+            sizes[adjusted_level] = num_nodes
+            first_id += num_nodes
+    # Internal level structure, optionally built in parallel with per-level streams
+    level_edges = iter_level_edges(level_node_dict, probability_distribution, engine, rng, workers, wiring_plans)
+
+    degrees = get_degree_index(G)
+    attributes = get_attribute_store(G)
+    np_rng = None
+    if batched:
+        # Seeded from rng so the seed (or random.seed()) still reproduces a run
+        np_rng = np.random.default_rng(rng.getrandbits(64))
+
+    try:
+        for i, (level_number, num_nodes) in enumerate(level_node_dict.items()):
+            # Adjust the level number to start from the next available level
+            adjusted_level = start_level + level_number - min(level_node_dict.keys())
+            edges_before = degrees.number_of_edges()
+            with span(f"level {adjusted_level}", "generation", nodes=num_nodes):
+                add_level(G, rng, np_rng, level_edges, level_index, adjusted_level, num_nodes, root_node, degrees,
+                          attributes, connections_per_node, jump_probability, batched)
+            if progress is not None:
+                total_edges = degrees.number_of_edges()
+                progress({"level": adjusted_level, "done": i + 1, "total": len(level_node_dict),
+                          "nodes_added": num_nodes, "edges_added": total_edges - edges_before,
+                          "total_nodes": len(degrees), "total_edges": total_edges})
+    finally:
+        level_edges.close()
     
     return G
 
@@ -0,0 +1,12 @@
+import networkx as nx
+
+
+def store_graph_index(G, key, value):
+    """Keep an index built for G in G.graph[key] and return it.
+
+    Subgraph views share G.graph with their parent, so an index built for a
+    view is returned without being stored over the parent's.
+    """
+    if not nx.is_frozen(G):
+        G.graph[key] = value
+    return value
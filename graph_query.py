@@ -1,67 +1,412 @@
+import time
+import weakref
 import networkx as nx
+from itertools import chain, islice
+from cache import LRUCache
+from analytics import DEFAULT_CONFIDENCE, DEFAULT_SAMPLES
+from csr_graph import CSRGraph
+from csr_queries import (ANALYTICS_METHODS, analytics, degree_centrality, descendants_and_ancestors, edges_within,
+                         iter_visit_order, level_reachability, shortest_path as csr_shortest_path, simple_paths)
+from degree_index import get_degree_index
+from node_attrs import get_attribute_store
+from reachability import existing_reachability_index
+from path_count import PATH_COUNT_BUDGET
+from profiling import span
 from visualize import visualize_graph1, visualize_graph2
 
-def get_subgraph(G, source_node, max_depth):
-    nodes = set([source_node])
-    for _ in range(max_depth):
-        nodes |= set(n for node in nodes for n in G.neighbors(node))
-    return G.subgraph(nodes)
-
-def demonstrate_traversal_methods(G, method, source, target=None, max_depth=None):
+# Which edges "Subgraph Extraction" follows away from the source
+SUBGRAPH_DIRECTIONS = ["successors", "predecessors", "both"]
+# Rows per page of a DFS/BFS result, and how many visited nodes are drawn
+PAGE_SIZE = 50
+DRAW_LIMIT = 20
+
+
+class TraversalResult:
+    """A DFS/BFS visit order that is only computed as far as it is read.
+
+    `traverse` returns a fresh iterator over node names in visit order.
+    Pages are served from the prefix read so far, so showing a page runs
+    the traversal just far enough to fill it; `limit` caps it altogether.
+    The total comes from `count` when given (e.g. a reachability index),
+    otherwise from a separate run that counts without keeping the nodes.
+    """
+
+    def __init__(self, title, traverse, limit=None, count=None, page_size=PAGE_SIZE):
+        self.title = title
+        self.limit = limit
+        self.page_size = page_size
+        self._traverse = traverse
+        self._count = count
+        self._total = None
+        self._nodes = self._iter()
+        self._visited = []
+        self.exhausted = False
+
+    def _iter(self):
+        nodes = self._traverse()
+        return nodes if self.limit is None else islice(nodes, self.limit)
+
+    def nodes(self, offset=0, count=None):
+        """Up to `count` nodes (default: one page) starting at position `offset` of the visit order."""
+        end = offset + (self.page_size if count is None else count)
+        if end > len(self._visited) and not self.exhausted:
+            self._visited.extend(islice(self._nodes, end - len(self._visited)))
+            if len(self._visited) < end:
+                self.exhausted = True
+                self._total = len(self._visited)
+        return self._visited[offset:end]
+
+    def page(self, number):
+        """Nodes on page `number`, counting from 0."""
+        return self.nodes(number * self.page_size)
+
+    def total(self):
+        if self._total is None:
+            if self._count is not None:
+                total = self._count()
+                self._total = total if self.limit is None else min(total, self.limit)
+            else:
+                self._total = sum(1 for _ in self._iter())
+        return self._total
+
+    def num_pages(self):
+        return max(1, -(-self.total() // self.page_size))
+
+    def __str__(self):
+        first = self.page(0)
+        more = "" if self.exhausted and len(self._visited) <= self.page_size else "..."
+        return f"{self.title}: {first}{more}"
+
+
+class DepthLimitedSubgraph:
+    """Nodes within max_depth of a source, with the BFS depth of each.
+
+    The networkx subgraph view is only created when `graph` is first used, so
+    callers that need counts or depths never pay for it. Found on a CSR
+    snapshot (`csr` and the reached `ids`), the edges are counted on its
+    arrays, which also works when G is None.
+    """
+
+    def __init__(self, G, depth, truncated=False, csr=None, ids=None):
+        self.G = G
+        self.depth = depth
+        self.truncated = truncated
+        self.csr = csr
+        self.ids = ids
+        self._graph = None
+
+    @property
+    def graph(self):
+        if self._graph is None:
+            self._graph = self.G.subgraph(self.depth)
+        return self._graph
+
+    def number_of_nodes(self):
+        return len(self.depth)
+
+    def number_of_edges(self):
+        if self.csr is None:
+            return self.graph.number_of_edges()
+        return edges_within(self.csr, self.ids)
+
+    def nodes_per_depth(self):
+        counts = {}
+        for d in self.depth.values():
+            counts[d] = counts.get(d, 0) + 1
+        return [counts[d] for d in sorted(counts)]
+
+
+def _frontier_depths(G, source_node, max_depth, direction, max_nodes):
+    neighbours = {"successors": lambda n: G.successors(n), "predecessors": lambda n: G.predecessors(n),
+                  "both": lambda n: [*G.successors(n), *G.predecessors(n)]}[direction]
+    depth = {source_node: 0}
+    frontier = [source_node]
+    d = 0
+    while frontier and (max_depth is None or d < max_depth):
+        d += 1
+        next_frontier = []
+        for node in frontier:
+            for n in neighbours(node):
+                if n not in depth:
+                    if max_nodes is not None and len(depth) >= max_nodes:
+                        return depth, True
+                    depth[n] = d
+                    next_frontier.append(n)
+        frontier = next_frontier
+    return depth, False
+
+
+def get_subgraph(G, source_node, max_depth, csr=None, direction="successors", max_nodes=None):
+    """Nodes reachable from source_node within max_depth hops, by a frontier BFS that expands each node once.
+
+    direction is one of SUBGRAPH_DIRECTIONS; the search stops early once
+    max_nodes nodes have been collected.
+    """
+    if csr is not None:
+        ids, depths, truncated = csr.depth_limited_bfs(csr.node_id(source_node), max_depth, direction, max_nodes)
+        return DepthLimitedSubgraph(G, dict(zip(csr.to_names(ids), depths.tolist())), truncated, csr, ids)
+    depth, truncated = _frontier_depths(G, source_node, max_depth, direction, max_nodes)
+    return DepthLimitedSubgraph(G, depth, truncated)
+
+def _draw(drawings, function, *args, **kwargs):
+    if drawings is None:
+        function(*args, **kwargs)
+    else:
+        drawings.append((function, args, kwargs))
+
+def traversal_result(G, method, source, csr=None, limit=None):
+    """Lazy DFS preorder or BFS order from source, as a TraversalResult."""
+    title = "DFS traversal order" if method == "Depth-First Search (DFS)" else "BFS traversal order"
+    if csr is None:
+        if method == "Depth-First Search (DFS)":
+            return TraversalResult(title, lambda: nx.dfs_preorder_nodes(G, source=source), limit)
+        return TraversalResult(title, lambda: chain([source], (v for _, v in nx.bfs_edges(G, source))), limit)
+
+    source_id = csr.node_id(source)
+    names = csr.names
+    # Every node reachable from source is visited once, so an index built earlier already knows the total
+    index = existing_reachability_index(csr)
+    count = (lambda: index.descendant_count(source_id) + 1) if index is not None else None
+    return TraversalResult(title, lambda: (names[i] for i in iter_visit_order(csr, method, source_id)), limit, count)
+
+def _ref(obj):
+    return weakref.ref(obj) if obj is not None else lambda: None
+
+class QueryCache:
+    """LRU caches in front of demonstrate_traversal_methods for the graph being queried.
+
+    Results are keyed by every query parameter. Rendered figures (PNG bytes)
+    live in a second, byte-bounded cache, so an evicted figure is redrawn
+    from its recorded drawing without recomputing the query. Both belong to
+    one graph version: weak references to the graph (None for a snapshot
+    opened without networkx) and its CSR snapshot plus its node and edge
+    counts. Replacing the graph, appending levels or rolling back changes
+    the version and clears both caches. Recorded drawings hold on to the
+    graph, so callers replacing it should clear() the cache rather than
+    wait for the next validate().
+    """
+
+    def __init__(self, max_results=128, max_figure_bytes=64 * 2**20):
+        self.results = LRUCache(max_entries=max_results)
+        self.figures = LRUCache(max_bytes=max_figure_bytes)
+        self.invalidations = 0
+        self._version = None
+        self._latency = {"hit": [0, 0.0], "miss": [0, 0.0]}
+
+    def validate(self, G, csr=None):
+        """Clear the caches unless they were filled for this graph version."""
+        version = self._version
+        counted = G if G is not None else csr
+        size = (counted.number_of_nodes(), counted.number_of_edges())
+        if version is not None and version[0]() is G and version[1]() is csr and version[2] == size:
+            return
+        self.clear()
+        self._version = (_ref(G), _ref(csr), size)
+
+    def clear(self):
+        """Drop every cached result and figure, and the graph references they hold."""
+        if self.results or self.figures:
+            self.invalidations += 1
+        self.results.clear()
+        self.figures.clear()
+        self._version = None
+
+    def run(self, G, method, source, target=None, max_depth=None, csr=None, path_engine="landmark",
+            degree_kind="total", level=None, direction="successors", max_nodes=None, samples=DEFAULT_SAMPLES,
+            workers=None, visualize=True):
+        """demonstrate_traversal_methods through the cache; returns (result, figures as PNG bytes, hit)."""
+        start = time.perf_counter()
+        self.validate(G, csr)
+        # The worker count only changes how a result is computed, so it is not part of the key
+        key = (method, source, target, max_depth, path_engine, degree_kind, level, direction, max_nodes, samples)
+        entry = self.results.get(key)
+        hit = entry is not None
+        if not hit:
+            drawings = []
+            result = demonstrate_traversal_methods(G, method, source, target, max_depth, csr, path_engine,
+                                                   degree_kind, level, direction, max_nodes, samples, workers,
+                                                   drawings=drawings)
+            entry = self.results.put(key, (result, drawings))
+        result, drawings = entry
+        figures = []
+        if visualize:
+            for i, (function, args, kwargs) in enumerate(drawings):
+                figures.append(self.figure((key, i), lambda: function(*args, show=False, **kwargs)))
+        latency = self._latency["hit" if hit else "miss"]
+        latency[0] += 1
+        latency[1] += time.perf_counter() - start
+        return result, figures, hit
+
+    def figure(self, key, render):
+        """PNG bytes cached under key, rendered by render() on a miss."""
+        return self.figures.get_or_create(key, render, sizeof=len)
+
+    def stats(self):
+        stats = {"results": self.results.stats(), "figures": self.figures.stats(),
+                 "invalidations": self.invalidations}
+        for outcome, (count, seconds) in self._latency.items():
+            stats[f"mean_{outcome}_ms"] = round(seconds / count * 1000, 2) if count else None
+        return stats
+
+def demonstrate_traversal_methods(G, method, *args, **kwargs):
+    # Each query is one profiling span; drawing shows up as nested render spans
+    with span(f"query: {method}", "query"):
+        return run_traversal_method(G, method, *args, **kwargs)
+
+def run_traversal_method(G, method, source, target=None, max_depth=None, csr=None, path_engine="landmark",
+                         degree_kind="total", level=None, direction="successors", max_nodes=None,
+                         samples=DEFAULT_SAMPLES, workers=None, visualize=True, drawings=None):
+    # csr is an optional CSRGraph snapshot of G; when given, queries run on its arrays.
+    # G may be None when only a snapshot is loaded; every method then runs on csr (the
+    # "networkx" path engine excepted) and nothing is drawn.
+    # path_engine picks the shortest-path engine (see shortest_path.PATH_ENGINES).
+    # degree_kind ("total", "in" or "out") and level (None for all) shape "Degree Centrality".
+    # direction (see SUBGRAPH_DIRECTIONS) and max_nodes shape "Subgraph Extraction"; max_nodes also
+    # caps DFS/BFS, which return a lazily computed TraversalResult instead of a string.
+    # "Level Reachability" uses level, max_depth (None for no limit) and direction as well.
+    # The analytics ("PageRank", "Approximate Betweenness", "K-Core Decomposition") list their top
+    # nodes on `level` (None for all); betweenness samples that many sources across `workers` processes.
+    # visualize=False skips drawing, e.g. when benchmarking the queries themselves; with a drawings
+    # list, figures are recorded there as (function, args, kwargs) instead of being drawn.
     result = ""
+    visualize = visualize and G is not None
     
-    if method == "Depth-First Search (DFS)":
-        dfs_tree = list(nx.dfs_preorder_nodes(G, source=source))
-        result = f"DFS traversal order: {dfs_tree}... " #[:90]
-        
-        subgraph = G.subgraph(dfs_tree[:20])
-    
-        visualize_graph1(subgraph, highlight_nodes=dfs_tree[:20], title="Depth-First Search (DFS) - First 20 Nodes")
-        
-       
-    elif method == "Breadth-First Search (BFS)":
-        bfs_tree = list(nx.bfs_tree(G, source=source))
-        result = f"BFS traversal order: {bfs_tree}... "
-        subgraph = G.subgraph(bfs_tree[:20])
-    
-        visualize_graph1(subgraph, highlight_nodes=bfs_tree[:20], title="Depth-First Search (DFS) - First 20 Nodes")
+    if method in ("Depth-First Search (DFS)", "Breadth-First Search (BFS)"):
+        result = traversal_result(G, method, source, csr, max_nodes)
+        first = result.nodes(0, DRAW_LIMIT)
+        if visualize:
+            _draw(drawings, visualize_graph1, G.subgraph(first), highlight_nodes=first,
+                  title=f"{method} - First {DRAW_LIMIT} Nodes")
     
     elif method == "Shortest Path":
-        try:
-            shortest_path = nx.shortest_path(G, source=source, target=target)
-            result = f"Shortest path from '{source}' to '{target}': {shortest_path}"
+        start = time.perf_counter()
+        if csr is not None and (path_engine != "networkx" or G is None):
+            path_ids, expanded = csr_shortest_path(csr, csr.node_id(source), csr.node_id(target), path_engine)
+            engine_stats = f"\n{path_engine} engine: {expanded} nodes expanded"
+            shortest_path = csr.to_names(path_ids) if path_ids is not None else None
+        else:
+            engine_stats = "\nnetworkx engine: expanded nodes not reported"
+            try:
+                shortest_path = nx.shortest_path(G, source=source, target=target)
+            except nx.NetworkXNoPath:
+                shortest_path = None
+        engine_stats += f" in {(time.perf_counter() - start) * 1000:.2f} ms"
+        if shortest_path is None:
+            result = "No path found between the specified nodes." + engine_stats
+        else:
+            result = f"Shortest path from '{source}' to '{target}': {shortest_path}" + engine_stats
             path_edges = list(zip(shortest_path, shortest_path[1:]))
-            visualize_graph1(G, highlight_nodes=shortest_path, highlight_edges=path_edges, title="Shortest Path")
-        except nx.NetworkXNoPath:
-            result = "No path found between the specified nodes."
+            if visualize:
+                _draw(drawings, visualize_graph1, G, highlight_nodes=shortest_path, highlight_edges=path_edges, title="Shortest Path")
     
     elif method == "All Simple Paths":
-        try:
-            all_paths = list(nx.all_simple_paths(G, source=source, target=target, cutoff=5))
-            result = f"Number of paths found (max length 5): {len(all_paths)}\nExample path: {all_paths[0] if all_paths else 'No paths found'}"
-            if all_paths:
-                example_path = all_paths[0]
+        if csr is not None:
+            # Count with DP / bounded enumeration instead of materializing every path
+            counted = simple_paths(csr, csr.node_id(source), csr.node_id(target))
+            if counted["method"] == "walk-upper-bound":
+                label = (f"walk-count upper bound; {counted['partial']} simple paths counted "
+                         f"before the {PATH_COUNT_BUDGET}s budget ran out")
+            else:
+                label = f"exact, {'dynamic programming' if counted['method'] == 'dag-dp' else 'enumerated'}"
+            example_path = csr.to_names(counted["examples"][0]) if counted["examples"] else None
+            result = f"Number of paths found (max length 5): {counted['count']} ({label})\nExample path: {example_path or 'No paths found'}"
+            if example_path:
                 path_edges = list(zip(example_path, example_path[1:]))
-                visualize_graph1(G, highlight_nodes=example_path, highlight_edges=path_edges, title="Example of Simple Path")
-        except nx.NetworkXNoPath:
-            result = "No paths found between the specified nodes."
+                if visualize:
+                    _draw(drawings, visualize_graph1, G, highlight_nodes=example_path, highlight_edges=path_edges, title="Example of Simple Path")
+        else:
+            try:
+                all_paths = list(nx.all_simple_paths(G, source=source, target=target, cutoff=5))
+                result = f"Number of paths found (max length 5): {len(all_paths)}\nExample path: {all_paths[0] if all_paths else 'No paths found'}"
+                if all_paths:
+                    example_path = all_paths[0]
+                    path_edges = list(zip(example_path, example_path[1:]))
+                    if visualize:
+                        _draw(drawings, visualize_graph1, G, highlight_nodes=example_path, highlight_edges=path_edges, title="Example of Simple Path")
+            except nx.NetworkXNoPath:
+                result = "No paths found between the specified nodes."
     
     elif method == "Descendants and Ancestors":
-        descendants = list(nx.descendants(G, source))
-        ancestors = list(nx.ancestors(G, source))
-        result = f"Descendants of '{source}': {descendants}... \nAncestors of '{source}': {ancestors}"
-        visualize_graph1(G, highlight_nodes=descendants + ancestors + [source], title="Descendants and Ancestors")
+        if csr is not None:
+            # Counts come from the reachability index; lists are enumerated lazily up to a limit
+            found = descendants_and_ancestors(csr, csr.node_id(source))
+            descendants = csr.to_names(found["descendants"])
+            ancestors = csr.to_names(found["ancestors"])
+            result = (f"Descendants of '{source}' ({found['descendant_count']}): {descendants}... \n"
+                      f"Ancestors of '{source}' ({found['ancestor_count']}): {ancestors}...")
+        else:
+            descendants = list(nx.descendants(G, source))
+            ancestors = list(nx.ancestors(G, source))
+            result = f"Descendants of '{source}': {descendants}... \nAncestors of '{source}': {ancestors}"
+        if visualize:
+            _draw(drawings, visualize_graph1, G, highlight_nodes=descendants + ancestors + [source], title="Descendants and Ancestors")
     
     elif method == "Degree Centrality":
-        degree_centrality = nx.degree_centrality(G)
-        sorted_centrality = sorted(degree_centrality.items(), key=lambda x: x[1], reverse=True)[:20]
-        result = "Top 20 nodes by degree centrality:\n" + "\n".join([f"  {node}: {centrality:.4f}" for node, centrality in sorted_centrality])
-        visualize_graph1(G, highlight_nodes=[node for node, _ in sorted_centrality], title="Top Nodes by Degree Centrality")
+        # Degrees come from the snapshot, or from the counters maintained during generation; either
+        # way this is one argpartition
+        if csr is not None:
+            top, centrality = degree_centrality(csr, degree_kind, level)
+            sorted_centrality = list(zip(csr.to_names(top), centrality))
+        else:
+            sorted_centrality = get_degree_index(G).top_k(20, degree_kind, level, get_attribute_store(G).levels)
+        label = "degree" if degree_kind == "total" else f"{degree_kind}-degree"
+        scope = "" if level is None else f" on level {level}"
+        result = f"Top 20 nodes by {label} centrality{scope}:\n" + "\n".join([f"  {node}: {centrality:.4f}" for node, centrality in sorted_centrality])
+        if visualize:
+            _draw(drawings, visualize_graph1, G, highlight_nodes=[node for node, _ in sorted_centrality], title="Top Nodes by Degree Centrality")
     
     elif method == "Subgraph Extraction":
-        subgraph = get_subgraph(G, source, max_depth)
-        result = f"Extracted subgraph from '{source}' with max depth {max_depth}\nSubgraph nodes: {subgraph.number_of_nodes()}\nSubgraph edges: {subgraph.number_of_edges()}"
-        visualize_graph2(subgraph, title=f"Subgraph (max depth: {max_depth})")
+        subgraph = get_subgraph(G, source, max_depth, csr, direction, max_nodes)
+        result = (f"Extracted subgraph from '{source}' with max depth {max_depth} ({direction})\n"
+                  f"Subgraph nodes: {subgraph.number_of_nodes()}\nSubgraph edges: {subgraph.number_of_edges()}\n"
+                  f"Nodes per depth: {subgraph.nodes_per_depth()}")
+        if subgraph.truncated:
+            result += f"\nStopped early at the {max_nodes} node cap"
+        if visualize:
+            _draw(drawings, visualize_graph2, subgraph.graph, title=f"Subgraph (max depth: {max_depth})")
+
+    elif method == "Level Reachability":
+        # One batched sparse BFS from every node on the level rather than a traversal per node
+        if csr is None:
+            csr = CSRGraph.from_networkx(G)
+        reach = level_reachability(csr, level, max_depth, direction)
+        reached = reach["reached"]
+        top = [(csr.names[i], count) for i, count in reach["top"]]
+        scope = "" if max_depth is None else f" within {max_depth} hops"
+        result = (f"Reachability from the {len(reach['sources'])} nodes on level {reach['level']} ({direction}{scope})\n"
+                  f"Nodes reached per source: min {reached.min()}, mean {reached.mean():.1f}, max {reached.max()}\n"
+                  f"Farthest node reached: {reach['farthest'].max()} hops\n"
+                  f"Nodes reached from any source: {reach['reached_by_any']} of {csr.number_of_nodes()}\n"
+                  f"Sources reaching the most nodes:\n" + "\n".join(f"  {node}: {count}" for node, count in top))
+        if visualize:
+            _draw(drawings, visualize_graph1, G, highlight_nodes=[node for node, _ in top],
+                  title=f"Level {reach['level']} Nodes Reaching the Most Nodes")
+
+    elif method in ANALYTICS_METHODS:
+        # Sparse / array implementations from analytics.py instead of networkx's pure-Python ones
+        if csr is None:
+            csr = CSRGraph.from_networkx(G)
+        scope = "" if level is None else f" on level {level}"
+        found = analytics(csr, method, level, samples, workers)
+        top = [(csr.names[i], score) for i, score in found["top"]]
+        if method == "PageRank":
+            result = (f"Top 20 nodes by PageRank{scope} (converged in {found['iterations']} iterations):\n"
+                      + "\n".join(f"  {node}: {score:.6f}" for node, score in top))
+        elif method == "Approximate Betweenness":
+            accuracy = ("exact, every source used" if found["samples"] == csr.number_of_nodes() else
+                        f"{found['samples']} sampled sources, within ±{found['error_bound']:.4f} for every node "
+                        f"with {DEFAULT_CONFIDENCE:.0%} confidence")
+            result = (f"Top 20 nodes by betweenness centrality{scope} ({accuracy}):\n"
+                      + "\n".join(f"  {node}: {score:.6f}" for node, score in top))
+        else:
+            sizes = found["nodes_per_core"]
+            result = (f"Maximum core number: {max(sizes)}\n"
+                      f"Nodes per core number: {sizes}\n"
+                      f"Top 20 nodes by core number{scope}:\n"
+                      + "\n".join(f"  {node}: {score}" for node, score in top))
+        if visualize:
+            _draw(drawings, visualize_graph1, G, highlight_nodes=[node for node, _ in top],
+                  title=f"Top Nodes by {method}")
 
     return result
 
@@ -0,0 +1,121 @@
+import numpy as np
+from csr_graph import CSRGraph
+from degree_index import get_degree_index
+from graph_gen import add_nodes_to_multiple_levels, copy_graph, get_level_index
+from node_attrs import get_attribute_store
+from profiling import span
+
+
+class GraphVersion:
+    """A point in a graph's history: how much of the append-only graph existed then."""
+
+    def __init__(self, number, label, num_nodes, num_edges, level_sizes, csr=None):
+        self.number = number
+        self.label = label
+        self.num_nodes = num_nodes
+        self.num_edges = num_edges
+        self.level_sizes = level_sizes
+        self.csr = csr
+
+    def __repr__(self):
+        return f"v{self.number} {self.label} ({self.num_nodes} nodes, {self.num_edges} edges)"
+
+
+class GraphHistory:
+    """Versions of one graph that only ever grows by appended levels.
+
+    Appending adds nodes and edges, and every new edge touches a new node, so
+    an earlier version is the graph minus the nodes added since. A version is
+    therefore just a watermark (node/edge counts and level sizes), never a
+    copy: appending updates the level, degree and attribute indexes in place,
+    and rolling back removes only the newer nodes and trims those indexes.
+    The frozen CSR snapshots of the most recent versions are kept, so rolling
+    back to one of them needs no rebuild (nor do its reachability and
+    shortest-path indexes, which are cached per snapshot).
+    """
+
+    def __init__(self, G, csr=None, label="generated", owned=False, max_snapshots=3):
+        self.graph = G
+        # The first graph may be shared (e.g. with the graph cache); it is copied once before the first append
+        self.owned = owned
+        self.max_snapshots = max_snapshots
+        self.versions = []
+        self._record(label, csr if csr is not None else CSRGraph.from_networkx(G))
+
+    @property
+    def current(self):
+        return self.versions[-1]
+
+    @property
+    def csr(self):
+        version = self.current
+        if version.csr is None:
+            version.csr = CSRGraph.from_networkx(self.graph)
+        return version.csr
+
+    def _record(self, label, csr):
+        G = self.graph
+        level_sizes = {level: len(nodes) for level, nodes in get_level_index(G).items()}
+        self.versions.append(GraphVersion(len(self.versions), label, G.number_of_nodes(), G.number_of_edges(),
+                                          level_sizes, csr))
+        for version in self.versions[:-self.max_snapshots]:
+            version.csr = None
+        return self.current
+
+    def append_levels(self, level_node_dict, **generation_options):
+        """Add levels below the current deepest one and record the result as a new version."""
+        if not self.owned:
+            self.graph = copy_graph(self.graph)
+            self.owned = True
+        start = max(get_level_index(self.graph)) + 1
+        with span("append levels", "generation", levels=len(level_node_dict)):
+            add_nodes_to_multiple_levels(self.graph, level_node_dict, **generation_options)
+        with span("csr snapshot", "generation"):
+            csr = CSRGraph.from_networkx(self.graph)
+        label = f"+ levels {start}-{start + len(level_node_dict) - 1}"
+        return self._record(label, csr)
+
+    def rollback(self, number):
+        """Return to version `number`, discarding every later version."""
+        target = self.versions[number]
+        G = self.graph
+        if target.num_nodes < G.number_of_nodes():
+            if not self.owned:
+                G = self.graph = copy_graph(G)
+                self.owned = True
+            with span("rollback", "generation", nodes=G.number_of_nodes() - target.num_nodes):
+                self._truncate(target)
+        del self.versions[number + 1:]
+        return self.current
+
+    def _truncate(self, target):
+        G = self.graph
+        # Fetch the indexes while they still match G; afterwards they are trimmed, not rebuilt
+        degrees = get_degree_index(G)
+        attributes = get_attribute_store(G)
+        level_index = get_level_index(G)
+        ids = degrees.ids
+        removed = degrees.names[target.num_nodes:]
+
+        # Every edge into a removed node, plus those from removed to kept nodes, goes away
+        src, dst = [], []
+        for node in removed:
+            node_id = ids[node]
+            for u in G.predecessors(node):
+                src.append(ids[u])
+                dst.append(node_id)
+            for v in G.successors(node):
+                if ids[v] < target.num_nodes:
+                    src.append(node_id)
+                    dst.append(ids[v])
+        degrees.remove_edges(np.array(src, dtype=np.int64), np.array(dst, dtype=np.int64))
+
+        G.remove_nodes_from(removed)
+        degrees.truncate(target.num_nodes)
+        attributes.truncate(target.num_nodes)
+        for level in list(level_index):
+            size = target.level_sizes.get(level, 0)
+            if size:
+                del level_index[level][size:]
+            else:
+                del level_index[level]
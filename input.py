@@ -39,12 +39,26 @@ def get_user_inputs():
 
     connections_per_node = st.number_input("Connections per node", min_value=1, value=2)
     jump_probability = st.slider("Jump probability", 0.0, 1.0, 0.1)
+    engine = st.radio("Generation engine", ["bucketed", "networkx"],
+                      help="'bucketed' is the fast sampler, 'networkx' the nx.gn_graph reference")
+    batched = st.checkbox("Batched construction", value=True,
+                          help="Draw parents and jumps per level as arrays and insert each level in one pass")
+    seed = st.number_input("Random seed", min_value=0, value=0, step=1,
+                           help="The same seed and settings reproduce the same graph")
+    workers = st.number_input("Worker processes", min_value=0, value=0, step=1,
+                              help="0 builds levels one after another; 1 or more gives every level its own seeded "
+                                   "stream and builds them in a process pool (same graph for any worker count). Inserting "
+                                   "into the graph stays in this process, which bounds the speedup")
 
     return {
         'probability_distribution': normalized_probability_distribution,
         'level_node_dict': level_node_dict,
         'connections_per_node': connections_per_node,
-        'jump_probability': jump_probability
+        'jump_probability': jump_probability,
+        'engine': engine,
+        'batched': batched,
+        'seed': int(seed),
+        'workers': int(workers) or None
     }
 
 
@@ -0,0 +1,97 @@
+import weakref
+import numpy as np
+from scipy.sparse import csr_matrix, vstack
+from profiling import span
+
+# Per chunk of sources the search holds a sources x nodes int32 distance
+# block, and a level's sparse product can approach that shape too (about 9
+# bytes per entry); the chunk size keeps both within this budget.
+DEFAULT_MAX_BYTES = 256 * 2**20
+BYTES_PER_CELL = 16
+
+_adjacency = weakref.WeakKeyDictionary()
+
+
+def adjacency_matrix(csr, direction="successors"):
+    """The snapshot's adjacency as a boolean scipy.sparse CSR matrix, built once per snapshot.
+
+    Row u holds the nodes one hop from u along `direction` ("successors",
+    "predecessors" or "both"). The one-way matrices share the snapshot's
+    index arrays; only the data array is new.
+    """
+    matrices = _adjacency.get(csr)
+    if matrices is None:
+        matrices = _adjacency[csr] = {}
+    matrix = matrices.get(direction)
+    if matrix is None:
+        if direction == "both":
+            matrix = (adjacency_matrix(csr, "successors") + adjacency_matrix(csr, "predecessors")).tocsr()
+        else:
+            n = csr.number_of_nodes()
+            indptr, indices = ((csr.rev_indptr, csr.rev_indices) if direction == "predecessors"
+                               else (csr.indptr, csr.indices))
+            matrix = csr_matrix((np.ones(len(indices), dtype=bool), indices, indptr), shape=(n, n))
+        matrices[direction] = matrix
+    return matrix
+
+
+def chunk_size_for(num_nodes, max_bytes=DEFAULT_MAX_BYTES):
+    """How many sources one chunk may hold to stay within max_bytes."""
+    return max(1, max_bytes // (BYTES_PER_CELL * max(num_nodes, 1)))
+
+
+def iter_multi_source_bfs(csr, sources, max_depth=None, direction="successors", chunk_size=None,
+                          max_bytes=DEFAULT_MAX_BYTES):
+    """BFS from many sources at once, a chunk of sources at a time.
+
+    All frontiers of a chunk are one sparse (sources x nodes) matrix and
+    each level is a single sparse product with the adjacency matrix, so the
+    work per level happens in scipy rather than once per source in Python.
+    Yields (start, distances) where distances[i, v] is the hop count from
+    sources[start + i] to node v, or -1 if v is not reached (within
+    max_depth). Only one chunk's block is alive at a time.
+    """
+    sources = np.asarray(sources, dtype=np.int64)
+    n = csr.number_of_nodes()
+    adjacency = adjacency_matrix(csr, direction)
+    chunk_size = chunk_size or chunk_size_for(n, max_bytes)
+    for start in range(0, len(sources), chunk_size):
+        chunk = sources[start:start + chunk_size]
+        k = len(chunk)
+        with span("multi-source BFS chunk", "query", sources=k):
+            distances = np.full((k, n), -1, dtype=np.int32)
+            rows = np.arange(k)
+            distances[rows, chunk] = 0
+            frontier = csr_matrix((np.ones(k, dtype=bool), (rows, chunk)), shape=(k, n))
+            depth = 0
+            while frontier.nnz and (max_depth is None or depth < max_depth):
+                depth += 1
+                reached = (frontier @ adjacency).tocoo()
+                new = distances[reached.row, reached.col] < 0
+                rows, cols = reached.row[new], reached.col[new]
+                distances[rows, cols] = depth
+                frontier = csr_matrix((np.ones(len(rows), dtype=bool), (rows, cols)), shape=(k, n))
+        yield start, distances
+
+
+def multi_source_distances(csr, sources, max_depth=None, direction="successors", chunk_size=None,
+                           max_bytes=DEFAULT_MAX_BYTES):
+    """(len(sources) x nodes) int32 hop counts from each source, -1 where unreachable."""
+    distances = np.empty((len(sources), csr.number_of_nodes()), dtype=np.int32)
+    for start, block in iter_multi_source_bfs(csr, sources, max_depth, direction, chunk_size, max_bytes):
+        distances[start:start + len(block)] = block
+    return distances
+
+
+def multi_source_reachability(csr, sources, max_depth=None, direction="successors", chunk_size=None,
+                              max_bytes=DEFAULT_MAX_BYTES):
+    """Boolean sparse (len(sources) x nodes) matrix of the nodes each source reaches, itself included.
+
+    Only reached pairs are stored, so the result stays small when each
+    source reaches a small part of the graph, however many sources there are.
+    """
+    blocks = [csr_matrix(block >= 0)
+              for _, block in iter_multi_source_bfs(csr, sources, max_depth, direction, chunk_size, max_bytes)]
+    if not blocks:
+        return csr_matrix((0, csr.number_of_nodes()), dtype=bool)
+    return vstack(blocks, format="csr")
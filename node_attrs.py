@@ -0,0 +1,140 @@
+import numpy as np
+from graph_index import store_graph_index
+
+
+class SharedNodeAttributes(dict):
+    """Read-only attribute dict shared by every generated node on one level.
+
+    networkx gives each node its own attribute dict; generated nodes only
+    differ by name, so they all point at one of these instead. Use
+    own_node_attributes() to give a node a private, writable dict.
+    """
+
+    def _read_only(self, *args, **kwargs):
+        raise TypeError("attributes shared by generated nodes are read-only; "
+                        "use node_attrs.own_node_attributes(G, node) to modify one node")
+
+    __setitem__ = __delitem__ = __ior__ = _read_only
+    update = pop = popitem = clear = setdefault = _read_only
+
+    def __reduce__(self):
+        return SharedNodeAttributes, (dict(self),)
+
+
+def add_nodes_shared(G, names, attrs):
+    """Add nodes to G that all use the shared `attrs` mapping instead of a dict each."""
+    # networkx creates the adjacency entries and an empty dict per node, which is replaced
+    G.add_nodes_from(names)
+    node_attrs = G._node
+    for name in names:
+        node_attrs[name] = attrs
+
+
+def own_node_attributes(G, node):
+    """The node's attribute dict, copied out of the shared mapping first if needed."""
+    attrs = G._node[node]
+    if isinstance(attrs, SharedNodeAttributes):
+        attrs = G._node[node] = dict(attrs)
+    return attrs
+
+
+def share_node_attributes(source, target):
+    """Point target's nodes at the shared mappings source uses, e.g. after G.copy() expanded them."""
+    target_attrs = target._node
+    for node, attrs in source._node.items():
+        if isinstance(attrs, SharedNodeAttributes) and node in target_attrs:
+            target_attrs[node] = attrs
+
+
+class NodeAttributeStore:
+    """Columnar level and node-type attributes, indexed by node id (insertion order).
+
+    Levels are kept as int16 and node types as int16 codes into a small table,
+    so per-node attributes cost four bytes instead of a dict. The store also
+    hands out the one SharedNodeAttributes mapping used per (level, node type).
+    """
+
+    def __init__(self, capacity=1024):
+        self.type_names = []
+        self._type_codes = {}
+        self._shared = {}
+        self._size = 0
+        self._levels = np.zeros(capacity, dtype=np.int16)
+        self._codes = np.zeros(capacity, dtype=np.int16)
+
+    @classmethod
+    def from_graph(cls, G):
+        store = cls(max(1024, G.number_of_nodes()))
+        for _, attrs in G.nodes(data=True):
+            level = attrs.get('level', 0)
+            store.append(level, attrs.get('node_type', f"level_{level}"))
+        return store
+
+    def copy(self):
+        store = NodeAttributeStore(len(self._levels))
+        store.type_names = list(self.type_names)
+        store._type_codes = dict(self._type_codes)
+        # The shared mappings are read-only, so copies can keep using them
+        store._shared = dict(self._shared)
+        store._size = self._size
+        store._levels[:] = self._levels
+        store._codes[:] = self._codes
+        return store
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def levels(self):
+        return self._levels[:self._size]
+
+    @property
+    def type_codes(self):
+        return self._codes[:self._size]
+
+    def type_code(self, node_type):
+        code = self._type_codes.get(node_type)
+        if code is None:
+            code = self._type_codes[node_type] = len(self.type_names)
+            self.type_names.append(node_type)
+        return code
+
+    def node_type(self, node_id):
+        return self.type_names[self._codes[node_id]]
+
+    def shared_attributes(self, level, node_type):
+        """The read-only attribute mapping every generated node with this level and type shares."""
+        key = (level, node_type)
+        attrs = self._shared.get(key)
+        if attrs is None:
+            attrs = self._shared[key] = SharedNodeAttributes(level=level, node_type=node_type)
+        return attrs
+
+    def append(self, level, node_type, count=1):
+        """Record `count` new nodes with the same level and type; returns the first id."""
+        first = self._size
+        if first + count > len(self._levels):
+            capacity = max(first + count, 2 * len(self._levels))
+            for attr in ('_levels', '_codes'):
+                grown = np.zeros(capacity, dtype=np.int16)
+                grown[:first] = getattr(self, attr)[:first]
+                setattr(self, attr, grown)
+        self._levels[first:first + count] = level
+        self._codes[first:first + count] = self.type_code(node_type)
+        self._size += count
+        return first
+
+    def truncate(self, size):
+        """Forget nodes with id >= size."""
+        self._size = min(self._size, size)
+
+    def nbytes(self):
+        return self._levels.nbytes + self._codes.nbytes
+
+
+def get_attribute_store(G):
+    """The NodeAttributeStore kept in G.graph['attributes'], rebuilt if missing or out of date."""
+    store = G.graph.get('attributes')
+    if store is not None and len(store) == G.number_of_nodes():
+        return store
+    return store_graph_index(G, 'attributes', NodeAttributeStore.from_graph(G))
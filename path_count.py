@@ -0,0 +1,140 @@
+import time
+import numpy as np
+from itertools import islice
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import connected_components
+
+# How many nodes of a potentially huge result list are shown
+LIST_LIMIT = 100
+# Wall-clock seconds "All Simple Paths" may spend enumerating before falling back to a bound
+PATH_COUNT_BUDGET = 2.0
+
+
+def _distances(csr, source, cutoff, reverse=False):
+    dist = np.full(csr.number_of_nodes(), -1, dtype=np.int64)
+    for depth, layer in enumerate(csr.bfs_layers(source, reverse=reverse, max_depth=cutoff)):
+        dist[layer] = depth
+    return dist
+
+
+def _relevant_edges(csr, dist_from_source, dist_to_target, cutoff):
+    """Edges (u, v) that lie on some source -> target walk of length <= cutoff."""
+    relevant = (dist_from_source >= 0) & (dist_to_target >= 0) & (dist_from_source + dist_to_target <= cutoff)
+    nodes = np.flatnonzero(relevant)
+    src = np.repeat(nodes, np.diff(csr.indptr)[nodes])
+    dst, _ = csr._expand(nodes, csr.indptr, csr.indices)
+    keep = relevant[dst] & (dist_from_source[src] + 1 + dist_to_target[dst] <= cutoff)
+    return nodes, src[keep], dst[keep]
+
+
+def _is_acyclic(nodes, src, dst):
+    if len(src) == 0:
+        return True
+    if np.any(src == dst):
+        return False
+    local = np.full(int(nodes.max()) + 1, -1, dtype=np.int64)
+    local[nodes] = np.arange(len(nodes))
+    adjacency = csr_matrix((np.ones(len(src), dtype=np.int8), (local[src], local[dst])), shape=(len(nodes),) * 2)
+    num_components, _ = connected_components(adjacency, directed=True, connection='strong')
+    return num_components == len(nodes)
+
+
+def count_walks(csr, source, target, cutoff, relevant=None):
+    """Number of source -> target walks with at most `cutoff` edges, by DP over (node, remaining length)."""
+    if relevant is None:
+        relevant = _relevant_edges(csr, _distances(csr, source, cutoff),
+                                   _distances(csr, target, cutoff, reverse=True), cutoff)
+    _, src, dst = relevant
+    ways = np.zeros(csr.number_of_nodes(), dtype=np.int64)  # walks of exactly k edges to target
+    ways[target] = 1
+    total = int(source == target)
+    for _ in range(cutoff):
+        step = np.zeros_like(ways)
+        np.add.at(step, src, ways[dst])
+        ways = step
+        total += int(ways[source])
+    return total
+
+
+def iter_simple_paths(csr, source, target, cutoff, dist_to_target=None, deadline=None):
+    """Lazily yield simple source -> target paths (as id lists) with at most `cutoff` edges.
+
+    Branches that cannot reach the target within the remaining length are
+    never entered, so the first paths arrive without exploring the rest.
+    Raises TimeoutError once time.perf_counter() passes `deadline`.
+    """
+    if dist_to_target is None:
+        dist_to_target = _distances(csr, target, cutoff, reverse=True)
+    if dist_to_target[source] < 0:
+        return
+    if source == target:
+        yield [source]
+        return
+
+    indptr, indices = csr.indptr, csr.indices
+    path = [source]
+    on_path = {source}
+    stack = [iter(indices[indptr[source]:indptr[source + 1]].tolist())]
+    steps = 0
+    while stack:
+        steps += 1
+        if deadline is not None and steps % 4096 == 0 and time.perf_counter() > deadline:
+            raise TimeoutError("path enumeration ran out of time")
+        nxt = next(stack[-1], None)
+        if nxt is None:
+            stack.pop()
+            on_path.discard(path.pop())
+            continue
+        remaining = cutoff - len(path)
+        if nxt in on_path or dist_to_target[nxt] < 0 or dist_to_target[nxt] > remaining:
+            continue
+        if nxt == target:
+            yield path + [target]
+            continue
+        if remaining > 0:
+            path.append(nxt)
+            on_path.add(nxt)
+            stack.append(iter(indices[indptr[nxt]:indptr[nxt + 1]].tolist()))
+
+
+def count_paths(csr, source, target, cutoff=5, examples=1, time_budget=None):
+    """Count source -> target simple paths up to `cutoff` edges without materializing them.
+
+    Returns a dict with:
+      count    -- the number of paths found
+      exact    -- whether count is the exact simple-path count
+      method   -- "dag-dp" (walk DP on an acyclic region, where walks are simple paths),
+                  "enumeration" (pruned DFS over a region with cycles) or
+                  "walk-upper-bound" (budget ran out; count is the walk count, an upper bound)
+      partial  -- simple paths counted before the budget ran out (enumeration only)
+      examples -- the first `examples` paths as id lists
+      elapsed  -- seconds spent
+    """
+    start = time.perf_counter()
+    deadline = None if time_budget is None else start + time_budget
+    dist_to_target = _distances(csr, target, cutoff, reverse=True)
+    relevant = _relevant_edges(csr, _distances(csr, source, cutoff), dist_to_target, cutoff)
+
+    found = []
+    try:
+        found.extend(islice(iter_simple_paths(csr, source, target, cutoff, dist_to_target, deadline), examples))
+    except TimeoutError:
+        pass
+    result = {"examples": found, "partial": None}
+
+    if source == target or _is_acyclic(*relevant):
+        # Without cycles no walk can revisit a node, so the walk DP is the exact count
+        result.update(count=count_walks(csr, source, target, cutoff, relevant) if source != target else 1,
+                      exact=True, method="dag-dp")
+    else:
+        count = 0
+        try:
+            for _ in iter_simple_paths(csr, source, target, cutoff, dist_to_target, deadline):
+                count += 1
+            result.update(count=count, exact=True, method="enumeration")
+        except TimeoutError:
+            result.update(count=count_walks(csr, source, target, cutoff, relevant), exact=False,
+                          method="walk-upper-bound", partial=count)
+
+    result["elapsed"] = time.perf_counter() - start
+    return result
@@ -0,0 +1,165 @@
+import functools
+import json
+import os
+import threading
+import time
+import tracemalloc
+from contextlib import nullcontext
+
+# Profiling is off unless enable() is called; span() then returns this shared
+# no-op context manager, so instrumented code pays one call and a flag check.
+_NULL_SPAN = nullcontext()
+
+# The switch and the recorded spans are process-wide, like tracemalloc itself:
+# every Streamlit session in one server shares them, so profiling is meant for
+# a single user at a time.
+_enabled = False
+# Whether tracemalloc was started here (and so is ours to stop)
+_started_tracemalloc = False
+_events = []
+_origin_ns = time.perf_counter_ns()
+_local = threading.local()
+
+
+def enable(trace_memory=True):
+    """Start recording spans; with trace_memory, also tracemalloc allocation deltas."""
+    global _enabled, _started_tracemalloc
+    if trace_memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+        _started_tracemalloc = True
+    elif not trace_memory:
+        _stop_tracemalloc()
+    _enabled = True
+
+
+def disable():
+    global _enabled
+    _enabled = False
+    _stop_tracemalloc()
+
+
+def _stop_tracemalloc():
+    # Tracing started by someone else (e.g. python -X tracemalloc) is left running
+    global _started_tracemalloc
+    if _started_tracemalloc and tracemalloc.is_tracing():
+        tracemalloc.stop()
+    _started_tracemalloc = False
+
+
+def is_enabled():
+    return _enabled
+
+
+def reset():
+    """Drop recorded spans."""
+    _events.clear()
+
+
+def events():
+    return list(_events)
+
+
+class _Span:
+    __slots__ = ("name", "category", "args", "start_ns", "start_bytes")
+
+    def __init__(self, name, category, args):
+        self.name = name
+        self.category = category
+        self.args = args
+
+    def __enter__(self):
+        _local.depth = getattr(_local, "depth", 0) + 1
+        self.start_bytes = tracemalloc.get_traced_memory()[0] if tracemalloc.is_tracing() else None
+        self.start_ns = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        end_ns = time.perf_counter_ns()
+        _local.depth -= 1
+        allocated = None
+        if self.start_bytes is not None and tracemalloc.is_tracing():
+            allocated = tracemalloc.get_traced_memory()[0] - self.start_bytes
+        _events.append({
+            "name": self.name,
+            "category": self.category,
+            "start_us": (self.start_ns - _origin_ns) / 1000,
+            "duration_us": (end_ns - self.start_ns) / 1000,
+            "allocated_bytes": allocated,
+            "depth": _local.depth,
+            "thread": threading.get_ident(),
+            "args": self.args,
+        })
+        return False
+
+
+def span(name, category="app", **args):
+    """Context manager timing a block as one span when profiling is enabled."""
+    if not _enabled:
+        return _NULL_SPAN
+    return _Span(name, category, args)
+
+
+def traced(name=None, category="app"):
+    """Decorator recording every call of a function as a span."""
+    def decorate(func):
+        label = name or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            with _Span(label, category, {}):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def summary(recorded=None):
+    """Per-phase breakdown: one row per span name, in order of first appearance.
+
+    Self time excludes time spent in spans nested directly inside.
+    """
+    recorded = _events if recorded is None else recorded
+    rows = {}
+    child_time = [0.0] * len(recorded)
+    # Spans are appended when they end, so a parent follows its children
+    open_children = {}
+    for i, event in enumerate(recorded):
+        key = (event["thread"], event["depth"] + 1)
+        for child in open_children.pop(key, []):
+            child_time[i] += recorded[child]["duration_us"]
+        open_children.setdefault((event["thread"], event["depth"]), []).append(i)
+
+    for i, event in enumerate(recorded):
+        row = rows.setdefault(event["name"], {"phase": event["name"], "category": event["category"], "calls": 0,
+                                              "total_ms": 0.0, "self_ms": 0.0, "allocated_kib": None})
+        row["calls"] += 1
+        row["total_ms"] += event["duration_us"] / 1000
+        row["self_ms"] += (event["duration_us"] - child_time[i]) / 1000
+        if event["allocated_bytes"] is not None:
+            row["allocated_kib"] = (row["allocated_kib"] or 0.0) + event["allocated_bytes"] / 1024
+    for row in rows.values():
+        row["mean_ms"] = row["total_ms"] / row["calls"]
+    return list(rows.values())
+
+
+def chrome_trace(recorded=None):
+    """Spans in Chrome trace event format (load in chrome://tracing or Perfetto)."""
+    recorded = _events if recorded is None else recorded
+    pid = os.getpid()
+    trace_events = []
+    for event in recorded:
+        args = dict(event["args"])
+        if event["allocated_bytes"] is not None:
+            args["allocated_bytes"] = event["allocated_bytes"]
+        trace_events.append({"name": event["name"], "cat": event["category"], "ph": "X", "pid": pid,
+                             "tid": event["thread"], "ts": event["start_us"], "dur": event["duration_us"],
+                             "args": {k: str(v) if not isinstance(v, (int, float, str)) else v
+                                      for k, v in args.items()}})
+    return {"traceEvents": trace_events, "displayTimeUnit": "ms"}
+
+
+def write_chrome_trace(path, recorded=None):
+    with open(path, "w") as f:
+        json.dump(chrome_trace(recorded), f)
+    return path
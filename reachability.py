@@ -0,0 +1,210 @@
+import threading
+import weakref
+import numpy as np
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import connected_components
+from cache import LRUCache
+from csr_graph import CSRGraph
+
+# Bitset labels cost components^2 / 8 bytes and about as many operations to
+# count; above this (roughly 16k components, well under a second to build) the
+# index keeps only topological ranks and answers by pruned search over the
+# condensation.
+DEFAULT_MAX_BYTES = 32 * 2**20
+
+_indexes = weakref.WeakKeyDictionary()
+# Serializes builds, so concurrent first callers share one index
+_lock = threading.Lock()
+
+
+def reachability_index(csr, max_bytes=DEFAULT_MAX_BYTES):
+    """The ReachabilityIndex for a CSRGraph, built on first use.
+
+    The index is tied to the snapshot object, so replacing the graph (and with
+    it the snapshot) invalidates it automatically. The index keeps only arrays
+    derived from the snapshot, never the snapshot itself, so the weak key can
+    actually die.
+    """
+    index = _indexes.get(csr)
+    if index is None:
+        with _lock:
+            index = _indexes.get(csr)
+            if index is None:
+                index = _indexes[csr] = ReachabilityIndex(csr, max_bytes)
+    return index
+
+
+def build_in_background(csr, max_bytes=DEFAULT_MAX_BYTES):
+    """Start building the index for csr in a daemon thread, so the first query finds it ready."""
+    thread = threading.Thread(target=reachability_index, args=(csr, max_bytes), name="reachability-index",
+                              daemon=True)
+    thread.start()
+    return thread
+
+
+def existing_reachability_index(csr):
+    """The ReachabilityIndex for csr if one has already been built, otherwise None."""
+    return _indexes.get(csr)
+
+
+class ReachabilityIndex:
+    """Descendant/ancestor queries over the SCC condensation of a CSRGraph.
+
+    Jump edges create cycles, so nodes are first collapsed into strongly
+    connected components. Each component of the condensed DAG gets a
+    reflexive reachability bitset (when they fit in max_bytes) plus a
+    topological rank, and per-node descendant/ancestor counts are
+    precomputed from the bitsets.
+    """
+
+    def __init__(self, csr, max_bytes=DEFAULT_MAX_BYTES):
+        n = csr.number_of_nodes()
+        adjacency = csr_matrix((np.ones(len(csr.indices), dtype=np.int8), csr.indices, csr.indptr), shape=(n, n))
+        self.num_components, self.component = connected_components(adjacency, directed=True, connection='strong')
+        c = self.num_components
+
+        # Members of each component, grouped contiguously
+        self.member_order = np.argsort(self.component, kind='stable')
+        self.sizes = np.bincount(self.component, minlength=c)
+        self.member_indptr = np.zeros(c + 1, dtype=np.int64)
+        np.cumsum(self.sizes, out=self.member_indptr[1:])
+
+        # Condensed DAG, forward and reverse, without duplicate or internal edges
+        src = self.component[np.repeat(np.arange(n), np.diff(csr.indptr))]
+        dst = self.component[csr.indices]
+        keep = src != dst
+        dag = csr_matrix((np.ones(int(keep.sum()), dtype=np.int8), (src[keep], dst[keep])), shape=(c, c))
+        dag.sum_duplicates()
+        self.dag_indptr, self.dag_indices = dag.indptr, dag.indices
+        dag_t = dag.T.tocsr()
+        self.rev_indptr, self.rev_indices = dag_t.indptr, dag_t.indices
+
+        self.topo_order = self._topological_order()
+        self.rank = np.empty(c, dtype=np.int64)
+        self.rank[self.topo_order] = np.arange(c)
+
+        self.words = (c + 63) // 64
+        self.bits = None
+        self._counts = LRUCache(max_entries=4096)
+        if c * self.words * 8 <= max_bytes:
+            self._build_bitsets()
+
+    def _topological_order(self):
+        # Kahn's algorithm, one whole frontier of zero in-degree components at a time
+        in_degree = np.diff(self.rev_indptr).copy()
+        frontier = np.flatnonzero(in_degree == 0)
+        order = []
+        while len(frontier):
+            order.append(frontier)
+            children, _ = CSRGraph._expand(frontier, self.dag_indptr, self.dag_indices)
+            np.subtract.at(in_degree, children, 1)
+            frontier = np.unique(children[in_degree[children] == 0])
+        return np.concatenate(order) if order else np.zeros(0, dtype=np.int64)
+
+    def _build_bitsets(self):
+        c = self.num_components
+        bits = np.zeros((c, self.words), dtype=np.uint64)
+        ids = np.arange(c)
+        bits[ids, ids // 64] = np.left_shift(np.uint64(1), (ids % 64).astype(np.uint64))
+        # Children come later in topological order, so walk it backwards
+        for comp in self.topo_order[::-1].tolist():
+            children = self.dag_indices[self.dag_indptr[comp]:self.dag_indptr[comp + 1]]
+            if len(children):
+                bits[comp] |= np.bitwise_or.reduce(bits[children], axis=0)
+        self.bits = bits
+
+        # Weighted popcounts: nodes reachable from / reaching each component. The
+        # products run in float64 (exact for any node count) so BLAS does them;
+        # uint8 by int64 products take numpy's slow generic loop.
+        sizes = self.sizes.astype(np.float64)
+        reach_size = np.zeros(c)
+        reached_by_size = np.zeros(c)
+        chunk = max(1, 2**20 // max(1, self.words * 64))
+        for start in range(0, c, chunk):
+            rows = np.unpackbits(bits[start:start + chunk].view(np.uint8), axis=1, bitorder='little')[:, :c]
+            rows = rows.astype(np.float64)
+            reach_size[start:start + chunk] = rows @ sizes
+            reached_by_size += sizes[start:start + chunk] @ rows
+        self.reach_size = reach_size.astype(np.int64)
+        self.reached_by_size = reached_by_size.astype(np.int64)
+
+    def _has_bit(self, row, comp):
+        return bool((self.bits[row, comp // 64] >> np.uint64(comp % 64)) & np.uint64(1))
+
+    def _component_reaches(self, a, b):
+        if a == b:
+            return True
+        if self.rank[b] <= self.rank[a]:
+            return False
+        if self.bits is not None:
+            return self._has_bit(a, b)
+        # Search only components that can still lie before b in topological order
+        limit = self.rank[b]
+        for comp in self._iter_components(a, reverse=False, rank_limit=limit):
+            if comp == b:
+                return True
+        return False
+
+    def is_descendant(self, source, node):
+        """True if `node` is reachable from `source` by a path of length >= 1."""
+        if source == node:
+            return self.sizes[self.component[source]] > 1
+        return self._component_reaches(self.component[source], self.component[node])
+
+    def is_ancestor(self, source, node):
+        return self.is_descendant(node, source)
+
+    def descendant_count(self, source):
+        comp = self.component[source]
+        if self.bits is not None:
+            return int(self.reach_size[comp]) - 1
+        return self._count(comp, reverse=False) - 1
+
+    def ancestor_count(self, source):
+        comp = self.component[source]
+        if self.bits is not None:
+            return int(self.reached_by_size[comp]) - 1
+        return self._count(comp, reverse=True) - 1
+
+    def _count(self, comp, reverse):
+        key = (comp, reverse)
+        count = self._counts.get(key)
+        if count is None:
+            count = self._counts.put(key, sum(int(self.sizes[c]) for c in self._iter_components(comp, reverse)))
+        return count
+
+    def _iter_components(self, comp, reverse, rank_limit=None):
+        """Components reachable from comp (reflexive), by BFS over the condensation."""
+        indptr, indices = (self.rev_indptr, self.rev_indices) if reverse else (self.dag_indptr, self.dag_indices)
+        seen = {comp}
+        queue = [comp]
+        for current in queue:
+            yield current
+            for nxt in indices[indptr[current]:indptr[current + 1]].tolist():
+                if nxt not in seen and (rank_limit is None or self.rank[nxt] <= rank_limit):
+                    seen.add(nxt)
+                    queue.append(nxt)
+
+    def _reachable_components(self, comp, reverse):
+        if self.bits is None:
+            yield from self._iter_components(comp, reverse)
+        elif not reverse:
+            row = np.unpackbits(self.bits[comp].view(np.uint8), bitorder='little')[:self.num_components]
+            yield from np.flatnonzero(row).tolist()
+        else:
+            column = (self.bits[:, comp // 64] >> np.uint64(comp % 64)) & np.uint64(1)
+            yield from np.flatnonzero(column).tolist()
+
+    def _iter_nodes(self, source, reverse):
+        for comp in self._reachable_components(self.component[source], reverse):
+            members = self.member_order[self.member_indptr[comp]:self.member_indptr[comp + 1]]
+            for node in members.tolist():
+                if node != source:
+                    yield node
+
+    def iter_descendants(self, source):
+        """Lazily yield descendant node ids, component by component."""
+        return self._iter_nodes(source, reverse=False)
+
+    def iter_ancestors(self, source):
+        return self._iter_nodes(source, reverse=True)
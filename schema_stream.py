@@ -0,0 +1,120 @@
+import codecs
+import itertools
+import json
+import re
+
+# One JSON token, optionally preceded by whitespace: a string (without its quotes),
+# a structural character, a number or a literal.
+_TOKEN = re.compile(r'[ \t\r\n]*(?:"([^"\\]*(?:\\.[^"\\]*)*)"|([{}\[\]:,])|(-?\d+(?:\.\d+)?(?:[eE][+-]?\d+)?)|(true|false|null))',
+                    re.S)
+_WHITESPACE = re.compile(r'[ \t\r\n]*')
+# What may follow a number that continues in the next chunk ("2" | ".5", "1e" | "5")
+_NUMBER_TAIL = re.compile(r'[.eE+\-]*\Z')
+_LITERALS = {"true": True, "false": False, "null": None}
+
+DEFAULT_CHUNK_SIZE = 1 << 20
+
+
+def _iter_chunks(source, chunk_size):
+    if isinstance(source, (str, bytes)):
+        chunks = [source]
+    else:
+        chunks = iter(lambda: source.read(chunk_size), source.read(0))
+    decoder = None
+    for chunk in chunks:
+        if isinstance(chunk, bytes):
+            decoder = decoder or codecs.getincrementaldecoder("utf-8-sig")()
+            chunk = decoder.decode(chunk)
+        yield chunk
+    if decoder is not None:
+        yield decoder.decode(b"", final=True)
+
+
+def _iter_tokens(source, chunk_size):
+    """Yield regex matches of whole tokens, reading `source` a chunk at a time."""
+    buffer, pos = "", 0
+    for chunk in itertools.chain(_iter_chunks(source, chunk_size), [None]):
+        at_end = chunk is None
+        buffer = buffer[pos:] + (chunk or "")
+        pos, end = 0, len(buffer)
+        # Back-to-back anchored matches, stopping at the first position that is not a whole token
+        for match in iter(_TOKEN.scanner(buffer).match, None):
+            # A token touching the end of the buffer may continue in the next chunk
+            if not at_end and (match.end() == end or
+                               (match.lastindex == 3 and _NUMBER_TAIL.match(buffer, match.end()))):
+                break
+            pos = match.end()
+            yield match
+        # Only the start of a string or a short number/literal may be waiting for the next chunk
+        rest = _WHITESPACE.match(buffer, pos).end()
+        if rest < end and (at_end or (buffer[rest] != '"' and end - rest > 64)):
+            raise ValueError(f"Invalid JSON near: {buffer[rest:rest + 40]!r}")
+
+
+def _scalar(match):
+    group = match.lastindex
+    if group == 1:
+        string = match.group(1)
+        return json.loads(f'"{string}"') if "\\" in string else string
+    if group == 3:
+        return json.loads(match.group(3))
+    return _LITERALS[match.group(4)]
+
+
+def iter_json_events(source, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Parse JSON incrementally into a flat stream of events.
+
+    `source` is a str, bytes, or a text or binary file object. Yields
+    ("start_map", None), ("key", name), ("end_map", None), ("start_array", None),
+    ("end_array", None) and ("value", scalar), so memory stays bounded by the
+    nesting depth and the chunk size rather than the document size.
+    """
+    containers = []  # "{" or "[" for each open container
+    # What the grammar allows next: "value", "value_or_end" (after '['), "key",
+    # "key_or_end" (after '{'), "colon", "comma_or_end", or "done" once the
+    # top-level value is complete
+    state = "value"
+    for match in _iter_tokens(source, chunk_size):
+        char = match.group(2)
+        if state == "done":
+            raise ValueError(f"Unexpected data after the JSON document: {match.group().strip()!r}")
+        if state in ("key", "key_or_end"):
+            if match.lastindex == 1:
+                yield "key", _scalar(match)
+                state = "colon"
+                continue
+            if state == "key" or char != "}":
+                raise ValueError(f"Expected an object key, got {match.group().strip()!r}")
+        elif state == "colon":
+            if char != ":":
+                raise ValueError(f"Expected ':' after an object key, got {match.group().strip()!r}")
+            state = "value"
+            continue
+        elif state == "comma_or_end":
+            if char == ",":
+                state = "key" if containers[-1] == "{" else "value"
+                continue
+            if char not in ("}", "]"):
+                raise ValueError(f"Expected ',' or the end of a container, got {match.group().strip()!r}")
+        elif char in (",", ":", "}") or (char == "]" and state == "value"):
+            raise ValueError(f"Expected a value, got {char!r}")
+
+        if char == "{":
+            containers.append(char)
+            state = "key_or_end"
+            yield "start_map", None
+            continue
+        if char == "[":
+            containers.append(char)
+            state = "value_or_end"
+            yield "start_array", None
+            continue
+        if char is None:
+            yield "value", _scalar(match)
+        else:
+            if containers.pop() != ("{" if char == "}" else "["):
+                raise ValueError(f"Unbalanced '{char}'")
+            yield ("end_map" if char == "}" else "end_array"), None
+        state = "comma_or_end" if containers else "done"
+    if state != "done":
+        raise ValueError("Unexpected end of JSON document")
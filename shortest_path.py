@@ -0,0 +1,135 @@
+import threading
+import weakref
+import numpy as np
+from csr_graph import CSRGraph
+
+PATH_ENGINES = ["landmark", "bidirectional", "networkx"]
+
+_engines = weakref.WeakKeyDictionary()
+_lock = threading.Lock()
+
+
+def shortest_path_engine(csr, num_landmarks=4):
+    """The ShortestPathEngine for a CSRGraph, with its landmark table built on first use."""
+    engine = _engines.get(csr)
+    if engine is None:
+        with _lock:
+            engine = _engines.get(csr)
+            if engine is None:
+                engine = _engines[csr] = ShortestPathEngine(csr, num_landmarks)
+    return engine
+
+
+class ShortestPathEngine:
+    """Unweighted shortest paths by bidirectional BFS, optionally pruned with landmarks.
+
+    The landmark table holds BFS distances from and to the root and a few
+    high-degree hubs. By the triangle inequality these give lower bounds on
+    d(u, v) (ALT), which prune frontier nodes that cannot improve on the best
+    meeting found so far and answer many "no path" queries without searching.
+    """
+
+    def __init__(self, csr, num_landmarks=4):
+        # _engines is keyed weakly by the snapshot; a strong reference here would keep it alive for good
+        self._csr = weakref.ref(csr)
+        self.num_landmarks = num_landmarks
+        self._landmarks = None
+        # Threads sharing the engine wait for one landmark build instead of each running their own
+        self._build_lock = threading.Lock()
+
+    @property
+    def csr(self):
+        return self._csr()
+
+    def _build_landmarks(self):
+        csr = self.csr
+        degrees = csr.out_degrees() + csr.in_degrees()
+        landmarks = [csr.node_id(csr.root)] if csr.root is not None else []
+        for hub in csr.top_k(degrees, self.num_landmarks).tolist():
+            if hub not in landmarks and len(landmarks) < self.num_landmarks:
+                landmarks.append(hub)
+
+        n = csr.number_of_nodes()
+        self.dist_from = np.full((len(landmarks), n), np.inf)
+        self.dist_to = np.full((len(landmarks), n), np.inf)
+        for row, landmark in enumerate(landmarks):
+            for depth, layer in enumerate(csr.bfs_layers(landmark)):
+                self.dist_from[row, layer] = depth
+            for depth, layer in enumerate(csr.bfs_layers(landmark, reverse=True)):
+                self.dist_to[row, layer] = depth
+        self._landmarks = landmarks
+
+    @property
+    def landmarks(self):
+        if self._landmarks is None:
+            with self._build_lock:
+                if self._landmarks is None:
+                    self._build_landmarks()
+        return self._landmarks
+
+    def lower_bound(self, u, v):
+        """ALT lower bound on d(u, v) for arrays of node ids (inf when no path can exist)."""
+        self.landmarks
+        u, v = np.atleast_1d(u), np.atleast_1d(v)
+        with np.errstate(invalid='ignore'):
+            # d(L,v) - d(L,u) and d(u,L) - d(v,L); inf - inf (no information) becomes nan
+            bound = np.fmax(self.dist_from[:, v] - self.dist_from[:, u], self.dist_to[:, u] - self.dist_to[:, v])
+        bound = np.nan_to_num(bound, nan=0.0, posinf=np.inf, neginf=0.0)
+        return np.maximum(bound.max(axis=0), 0) if len(bound) else np.zeros(bound.shape[1])
+
+    def query(self, source, target, use_landmarks=True):
+        """Return (path as a list of ids or None, number of nodes expanded)."""
+        if source == target:
+            return [source], 0
+        if use_landmarks and np.isinf(self.lower_bound(source, target)[0]):
+            return None, 0
+
+        csr = self.csr
+        n = csr.number_of_nodes()
+        forward = {"adjacency": (csr.indptr, csr.indices), "dist": np.full(n, -1, dtype=np.int64),
+                   "parent": np.full(n, -1, dtype=np.int64), "frontier": np.array([source]), "depth": 0}
+        backward = {"adjacency": (csr.rev_indptr, csr.rev_indices), "dist": np.full(n, -1, dtype=np.int64),
+                    "parent": np.full(n, -1, dtype=np.int64), "frontier": np.array([target]), "depth": 0}
+        forward["dist"][source] = 0
+        backward["dist"][target] = 0
+
+        best, meet, expanded = np.inf, -1, 0
+        while len(forward["frontier"]) and len(backward["frontier"]):
+            # Every path of length <= depth_f + depth_b has been seen already
+            if forward["depth"] + backward["depth"] + 1 >= best:
+                break
+            is_forward = len(forward["frontier"]) <= len(backward["frontier"])
+            side, other = (forward, backward) if is_forward else (backward, forward)
+
+            expanded += len(side["frontier"])
+            neighbours, origins = CSRGraph._expand(side["frontier"], *side["adjacency"])
+            mask = side["dist"][neighbours] < 0
+            neighbours, origins = neighbours[mask], origins[mask]
+            _, first = np.unique(neighbours, return_index=True)
+            first.sort()
+            new, origins = neighbours[first], origins[first]
+            side["depth"] += 1
+            side["dist"][new] = side["depth"]
+            side["parent"][new] = origins
+
+            meets = new[other["dist"][new] >= 0]
+            if len(meets):
+                totals = side["dist"][meets] + other["dist"][meets]
+                if totals.min() < best:
+                    best, meet = totals.min(), int(meets[totals.argmin()])
+
+            if use_landmarks and len(new):
+                # Drop nodes whose optimistic total cannot beat the best meeting (or the target at all)
+                bound = self.lower_bound(new, target) if is_forward else self.lower_bound(source, new)
+                new = new[side["depth"] + bound < best]
+            side["frontier"] = new
+
+        if meet < 0:
+            return None, expanded
+        path = [meet]
+        while path[-1] != source:
+            path.append(int(forward["parent"][path[-1]]))
+        path.reverse()
+        while path[-1] != target:
+            path.append(int(backward["parent"][path[-1]]))
+        return path, expanded
@@ -0,0 +1,129 @@
+import json
+import numpy as np
+from csr_graph import CSRGraph
+
+# File layout: MAGIC, an 8-byte little-endian header length, a JSON header
+# describing each array (dtype, offset from the data section, length), then
+# the data section. The data section and every array in it start on an
+# ALIGNMENT boundary so they can be opened with numpy.memmap.
+MAGIC = b"GRAPHSNP"
+VERSION = 1
+EXTENSION = ".gsnap"
+ALIGNMENT = 64
+
+
+class NameTable:
+    """Interned node names stored as one UTF-8 blob plus offsets, decoded on access."""
+
+    def __init__(self, offsets, blob):
+        self.offsets = offsets
+        self.blob = blob
+
+    @classmethod
+    def from_encoded(cls, encoded):
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(b) for b in encoded], out=offsets[1:])
+        return cls(offsets, np.frombuffer(b"".join(encoded), dtype=np.uint8))
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        return self.blob[self.offsets[i]:self.offsets[i + 1]].tobytes().decode("utf-8")
+
+    def __iter__(self):
+        return (self[i] for i in range(len(self)))
+
+
+class NameIndex:
+    """name -> id lookup by binary search over a name-sorted permutation of ids."""
+
+    def __init__(self, names, order):
+        self.names = names
+        self.order = order
+
+    def __getitem__(self, name):
+        key = name.encode("utf-8")
+        lo, hi = 0, len(self.order)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.names[int(self.order[mid])].encode("utf-8") < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < len(self.order) and self.names[int(self.order[lo])] == name:
+            return int(self.order[lo])
+        raise KeyError(name)
+
+    def __contains__(self, name):
+        try:
+            self[name]
+        except KeyError:
+            return False
+        return True
+
+
+def save_snapshot(csr, path):
+    """Write a CSRGraph to `path` in the binary snapshot format."""
+    encoded = [str(name).encode("utf-8") for name in csr.names]
+    names = NameTable.from_encoded(encoded)
+    arrays = {
+        "levels": csr.levels,
+        "indptr": csr.indptr,
+        "indices": csr.indices,
+        "rev_indptr": csr.rev_indptr,
+        "rev_indices": csr.rev_indices,
+        "name_offsets": names.offsets,
+        "name_blob": names.blob,
+        "name_order": np.array(sorted(range(len(encoded)), key=encoded.__getitem__), dtype=np.int64),
+    }
+
+    header = {"version": VERSION, "root": csr.root, "nodes": csr.number_of_nodes(),
+              "edges": csr.number_of_edges(), "arrays": {}}
+    offset = 0
+    for name, array in arrays.items():
+        header["arrays"][name] = {"dtype": array.dtype.str, "offset": offset, "length": len(array)}
+        offset = _align(offset + array.nbytes)
+    header_bytes = json.dumps(header).encode("utf-8")
+    data_start = _align(len(MAGIC) + 8 + len(header_bytes))
+
+    with open(path, "wb") as f:
+        f.write(MAGIC)
+        f.write(len(header_bytes).to_bytes(8, "little"))
+        f.write(header_bytes)
+        for name, array in arrays.items():
+            f.write(b"\0" * (data_start + header["arrays"][name]["offset"] - f.tell()))
+            np.ascontiguousarray(array).tofile(f)
+    return path
+
+
+def load_snapshot(path, mmap=True):
+    """Open a snapshot as a CSRGraph whose arrays are memory-mapped (or read fully if mmap=False)."""
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a graph snapshot")
+        header_length = int.from_bytes(f.read(8), "little")
+        header = json.loads(f.read(header_length))
+    if header["version"] != VERSION:
+        raise ValueError(f"Unsupported snapshot version {header['version']}")
+
+    data_start = _align(len(MAGIC) + 8 + header_length)
+    arrays = {}
+    for name, spec in header["arrays"].items():
+        offset = data_start + spec["offset"]
+        if mmap and spec["length"]:
+            # A plain ndarray view keeps the mapping alive without memmap's per-slice overhead
+            arrays[name] = np.memmap(path, dtype=spec["dtype"], mode="r", offset=offset,
+                                     shape=(spec["length"],)).view(np.ndarray)
+        else:
+            arrays[name] = np.fromfile(path, dtype=spec["dtype"], count=spec["length"], offset=offset)
+
+    names = NameTable(arrays["name_offsets"], arrays["name_blob"])
+    return CSRGraph(names, arrays["levels"], arrays["indptr"], arrays["indices"],
+                    arrays["rev_indptr"], arrays["rev_indices"], root=header["root"],
+                    ids=NameIndex(names, arrays["name_order"]))
+
+
+def _align(offset):
+    return -(-offset // ALIGNMENT) * ALIGNMENT
+
@@ -0,0 +1,51 @@
+import random
+import sys
+from collections import Counter
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from graph_gen import generate_level_edges, kernel_bucket
+
+PROBABILITY_DISTRIBUTION = [1.0, 0.8, 0.6, 0.4]
+NUM_NODES = 100
+RUNS = 400
+# Each histogram pools RUNS * NUM_NODES = 40,000 in-degrees per engine; the
+# total-variation distance between two samples of the same law stays far below this
+TV_TOLERANCE = 0.03
+
+
+def in_degree_samples(engine, seed):
+    rng = random.Random(seed)
+    samples = []
+    for _ in range(RUNS):
+        in_degree = [0] * NUM_NODES
+        for _, target in generate_level_edges(NUM_NODES, PROBABILITY_DISTRIBUTION, engine, rng):
+            in_degree[target] += 1
+        samples.extend(in_degree)
+    return samples
+
+
+def total_variation(a, b):
+    ca, cb = Counter(a), Counter(b)
+    return 0.5 * sum(abs(ca[k] / len(a) - cb[k] / len(b)) for k in ca.keys() | cb.keys())
+
+
+def test_engines_produce_the_same_degree_distribution():
+    bucketed = in_degree_samples("bucketed", seed=1)
+    reference = in_degree_samples("networkx", seed=2)
+
+    # Degrees above 10 are rare, so they share one bin
+    assert total_variation([min(d, 10) for d in bucketed], [min(d, 10) for d in reference]) < TV_TOLERANCE
+    # The kernel only sees degree buckets, so those must match as well
+    assert total_variation([kernel_bucket(d) for d in bucketed],
+                           [kernel_bucket(d) for d in reference]) < TV_TOLERANCE
+
+
+def test_engines_build_a_tree_over_every_node():
+    for engine in ("bucketed", "networkx"):
+        edges = generate_level_edges(NUM_NODES, PROBABILITY_DISTRIBUTION, engine, random.Random(0))
+        assert len(edges) == NUM_NODES - 1
+        # Every node but the first attaches to exactly one earlier node
+        assert sorted(u for u, _ in edges) == list(range(1, NUM_NODES))
+        assert all(v < u for u, v in edges)
@@ -0,0 +1,57 @@
+import json
+import sys
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from degree_index import DegreeIndex
+from graph_gen import add_nodes_to_multiple_levels, build_level_index, create_base_schema_graph
+from graph_versions import GraphHistory
+from node_attrs import NodeAttributeStore
+
+SCHEMA = {"Business Group": {"name": "root", "children": [
+    {"name": "family_a", "children": [{"name": "product_a", "children": [{"name": "module_a"}, {"name": "module_b"}]}]},
+    {"name": "family_b", "children": [{"name": "product_b", "children": [{"name": "module_c",
+                                                                           "connected_to": "family_a"}]}]}]}}
+OPTIONS = dict(connections_per_node=2, jump_probability=0.2, batched=True)
+
+
+def assert_indexes_rebuilt(G):
+    """The indexes kept in G.graph match ones built from scratch for G."""
+    degrees, rebuilt = G.graph['degrees'], DegreeIndex.from_graph(G)
+    assert degrees.names == rebuilt.names
+    assert degrees.ids == rebuilt.ids
+    np.testing.assert_array_equal(degrees.in_degree, rebuilt.in_degree)
+    np.testing.assert_array_equal(degrees.out_degree, rebuilt.out_degree)
+
+    attributes, rebuilt = G.graph['attributes'], NodeAttributeStore.from_graph(G)
+    np.testing.assert_array_equal(attributes.levels, rebuilt.levels)
+    assert ([attributes.node_type(i) for i in range(len(attributes))]
+            == [rebuilt.node_type(i) for i in range(len(rebuilt))])
+
+    assert G.graph['level_index'] == build_level_index(G.copy())
+
+
+def test_rollback_trims_indexes():
+    G = create_base_schema_graph(json.dumps(SCHEMA))
+    add_nodes_to_multiple_levels(G, {4: 20, 5: 30}, seed=1, **OPTIONS)
+    history = GraphHistory(G, owned=True)
+    snapshots = [(sorted(G.nodes), sorted(G.edges))]
+    for seed in (2, 3):
+        history.append_levels({0: 25, 1: 40}, seed=seed, **OPTIONS)
+        snapshots.append((sorted(history.graph.nodes), sorted(history.graph.edges)))
+        assert_indexes_rebuilt(history.graph)
+
+    degrees = history.graph.graph['degrees']
+    for number in (1, 0):
+        history.rollback(number)
+        G = history.graph
+        assert (sorted(G.nodes), sorted(G.edges)) == snapshots[number]
+        assert G.graph['degrees'] is degrees
+        assert_indexes_rebuilt(G)
+
+    # Appending after a rollback continues from the trimmed indexes
+    history.append_levels({0: 10}, seed=4, **OPTIONS)
+    assert_indexes_rebuilt(history.graph)
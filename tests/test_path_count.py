@@ -0,0 +1,64 @@
+import itertools
+import json
+import sys
+from pathlib import Path
+
+import networkx as nx
+import numpy as np
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from csr_graph import CSRGraph
+from graph_gen import add_nodes_to_multiple_levels, create_base_schema_graph
+from path_count import count_paths
+
+SCHEMA = {"Business Group": {"name": "root", "children": [
+    {"name": "family_a", "children": [{"name": "product_a", "children": [{"name": "module_a"}, {"name": "module_b"}]}]},
+    {"name": "family_b", "children": [{"name": "product_b", "children": [{"name": "module_c",
+                                                                           "connected_to": "family_a"}]}]}]}}
+CUTOFF = 6
+
+
+@pytest.fixture(scope="module")
+def graph():
+    # Jumps may point back up the levels, so some source -> target regions have cycles
+    G = create_base_schema_graph(json.dumps(SCHEMA))
+    add_nodes_to_multiple_levels(G, {4: 6, 5: 8, 6: 8}, connections_per_node=2, jump_probability=0.3,
+                                 batched=True, seed=11)
+    assert not nx.is_directed_acyclic_graph(G)
+    return G, CSRGraph.from_networkx(G)
+
+
+def test_counts_match_all_simple_paths(graph):
+    G, csr = graph
+    methods = set()
+    for source, target in itertools.permutations(G, 2):
+        expected = list(nx.all_simple_paths(G, source, target, cutoff=CUTOFF))
+        result = count_paths(csr, csr.node_id(source), csr.node_id(target), cutoff=CUTOFF)
+        assert result["exact"]
+        assert result["count"] == len(expected), (source, target, result["method"])
+        assert len(result["examples"]) == min(1, len(expected))
+        assert all(csr.to_names(path) in expected for path in result["examples"])
+        methods.add(result["method"])
+    assert methods == {"dag-dp", "enumeration"}
+
+
+def test_walk_upper_bound_when_out_of_time(graph):
+    G, csr = graph
+    source, target, cutoff = "module_a", "level_6_22", 10
+    simple = len(list(nx.all_simple_paths(G, source, target, cutoff=cutoff)))
+    # A zero budget stops enumeration at its first deadline check
+    result = count_paths(csr, csr.node_id(source), csr.node_id(target), cutoff=cutoff, time_budget=0)
+    assert result["method"] == "walk-upper-bound" and not result["exact"]
+    assert result["partial"] <= simple <= result["count"]
+
+    # Walks of up to `cutoff` edges, from powers of the adjacency matrix
+    nodes = list(G)
+    adjacency = nx.to_numpy_array(G, nodelist=nodes, dtype=np.int64)
+    s, t = nodes.index(source), nodes.index(target)
+    walks, power = 0, np.eye(len(nodes), dtype=np.int64)
+    for _ in range(cutoff):
+        power = power @ adjacency
+        walks += int(power[s, t])
+    assert result["count"] == walks
@@ -0,0 +1,65 @@
+import io
+import json
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from schema_stream import iter_json_events
+
+DOCUMENT = '{"a": [2.5, -1e5, 1.25E-3, 0, 17, true, null, "x\\"y"], "b": {"c": -0.5e+2, "d": []}, "e": 123456.75}'
+
+
+def rebuild(events):
+    """Turn an event stream back into the value it describes."""
+    stack, keys = [[]], []
+    for kind, value in events:
+        if kind == "key":
+            keys.append(value)
+        elif kind in ("start_map", "start_array"):
+            stack.append({} if kind == "start_map" else [])
+        else:
+            if kind != "value":
+                value = stack.pop()
+            container = stack[-1]
+            if isinstance(container, dict):
+                container[keys.pop()] = value
+            else:
+                container.append(value)
+    (result,) = stack[0]
+    return result
+
+
+@pytest.mark.parametrize("chunk_size", range(1, 12))
+def test_chunk_boundaries_inside_numbers(chunk_size):
+    expected = json.loads(DOCUMENT)
+    assert rebuild(iter_json_events(io.StringIO(DOCUMENT), chunk_size)) == expected
+    assert rebuild(iter_json_events(io.BytesIO(DOCUMENT.encode()), chunk_size)) == expected
+
+
+@pytest.mark.parametrize("text", ["2.5", "[1e5]", "-0.5E+2"])
+def test_top_level_and_split_exponent(text):
+    for chunk_size in range(1, len(text) + 1):
+        assert rebuild(iter_json_events(io.StringIO(text), chunk_size)) == json.loads(text)
+
+
+@pytest.mark.parametrize("text", [
+    '{"name": "x",}',
+    '[1 2 3]',
+    '[1,]',
+    '[,1]',
+    '{"a":1}{"b":2}',
+    '{"a":1} x',
+    '{"a":1}]',
+    '{"a" 1}',
+    '{"a":}',
+    '{1: 2}',
+    '{"a":1',
+    '',
+])
+def test_malformed_documents_are_rejected(text):
+    for chunk_size in (1, 4, 1 << 20):
+        with pytest.raises(ValueError):
+            list(iter_json_events(io.StringIO(text), chunk_size))
@@ -0,0 +1,44 @@
+import itertools
+import json
+import sys
+from pathlib import Path
+
+import networkx as nx
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from csr_graph import CSRGraph
+from graph_gen import add_nodes_to_multiple_levels, create_base_schema_graph
+from shortest_path import ShortestPathEngine
+
+SCHEMA = {"Business Group": {"name": "root", "children": [
+    {"name": "family_a", "children": [{"name": "product_a", "children": [{"name": "module_a"}, {"name": "module_b"}]}]},
+    {"name": "family_b", "children": [{"name": "product_b", "children": [{"name": "module_c",
+                                                                           "connected_to": "family_a"}]}]}]}}
+
+
+@pytest.fixture(scope="module")
+def graph():
+    G = create_base_schema_graph(json.dumps(SCHEMA))
+    add_nodes_to_multiple_levels(G, {4: 10, 5: 15, 6: 20}, connections_per_node=2, jump_probability=0.1,
+                                 batched=True, seed=5)
+    return G, CSRGraph.from_networkx(G)
+
+
+@pytest.mark.parametrize("use_landmarks", [True, False])
+def test_query_matches_shortest_path_length(graph, use_landmarks):
+    G, csr = graph
+    engine = ShortestPathEngine(csr)
+    unreachable = 0
+    for source, target in itertools.permutations(G, 2):
+        path, _ = engine.query(csr.node_id(source), csr.node_id(target), use_landmarks)
+        if not nx.has_path(G, source, target):
+            assert path is None, (source, target)
+            unreachable += 1
+            continue
+        path = csr.to_names(path)
+        assert path[0] == source and path[-1] == target
+        assert all(G.has_edge(u, v) for u, v in zip(path, path[1:]))
+        assert len(path) - 1 == nx.shortest_path_length(G, source, target), (source, target)
+    assert unreachable > 0
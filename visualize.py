@@ -1,17 +1,80 @@
+import io
+import weakref
 import matplotlib.pyplot as plt
 import networkx as nx
 import streamlit as st
+from graph_gen import get_level_index
+from profiling import traced
 
-def visualize_graph(G):
-    pos = nx.spring_layout(G, k=2, iterations=50)
+# Layouts of real graphs, dropped with the graph; entries are (node and edge counts, pos)
+_layouts = weakref.WeakKeyDictionary()
+# Same rendering as st.pyplot, so cached PNGs look like figures drawn live
+PNG_OPTIONS = {"format": "png", "dpi": 200, "bbox_inches": "tight"}
+
+def _finish(show):
+    """Show the current figure, or with show=False return it rendered as PNG bytes (e.g. for caching)."""
+    figure = plt.gcf()
+    png = None
+    if show:
+        st.pyplot(figure)
+    else:
+        buffer = io.BytesIO()
+        figure.savefig(buffer, **PNG_OPTIONS)
+        png = buffer.getvalue()
+    plt.close(figure)
+    return png
+
+def show_png(png):
+    st.image(png, width="stretch")
+
+def level_layout(G, level_gap=1.0):
+    """Layered positions in O(n): one row per level, nodes spread evenly across it."""
+    pos = {}
+    for level, level_nodes in get_level_index(G).items():
+        step = 1.0 / len(level_nodes)
+        for i, node in enumerate(level_nodes):
+            pos[node] = ((i + 0.5) * step - 0.5, -level * level_gap)
+    return pos
+
+def _cached_layout(G):
+    entry = _layouts.get(G)
+    if entry is not None and entry[0] == (G.number_of_nodes(), G.number_of_edges()):
+        return entry[1]
+    return None
+
+@traced(category="render")
+def get_layout(G):
+    """level_layout of G, cached per graph version (its node and edge counts).
+
+    Subgraph views reuse their parent's positions when the parent has been
+    laid out already, so query highlights line up with the full graph.
+    """
+    if nx.is_frozen(G):
+        parent = G
+        while hasattr(parent, '_graph'):
+            parent = parent._graph
+        parent_pos = _cached_layout(parent)
+        if parent_pos is not None:
+            return {node: parent_pos[node] for node in G}
+        return level_layout(G)
+    pos = _cached_layout(G)
+    if pos is None:
+        pos = level_layout(G)
+        _layouts[G] = ((G.number_of_nodes(), G.number_of_edges()), pos)
+    return pos
+
+@traced(category="render")
+def visualize_graph(G, pos=None, show=True):
+    if pos is None:
+        pos = get_layout(G)
     plt.figure(figsize=(12, 8))
     node_colors = ['#FF9999', '#66B2FF', '#99FF99', '#FFCC99', '#FF99CC', '#CCCCFF']
     
-    max_level = max(G.nodes[node].get('level', 0) for node in G.nodes())
+    level_index = get_level_index(G)
     
-    for level in range(max_level + 1):
+    for level, level_nodes in sorted(level_index.items()):
         nx.draw_networkx_nodes(G, pos, 
-                               nodelist=[n for n, d in G.nodes(data=True) if d.get('level', 0) == level],
+                               nodelist=level_nodes,
                                node_color=node_colors[level % len(node_colors)],
                                node_size=1000,
                                alpha=0.8)
@@ -27,16 +90,18 @@ def visualize_graph(G):
     plt.savefig("graph.png")
     
     # Display the figure in Streamlit
-    st.pyplot(plt)
+    return _finish(show)
 
-def visualize_graph1(G, highlight_nodes=None, highlight_edges=None, title="Graph Visualization"):
+@traced(category="render")
+def visualize_graph1(G, highlight_nodes=None, highlight_edges=None, title="Graph Visualization", pos=None, show=True):
     plt.figure(figsize=(12, 8))
     
     # Create a subgraph with only the first 20 nodes
     nodes_to_draw = highlight_nodes[:20]
     subgraph = G.subgraph(nodes_to_draw)
     
-    pos = nx.spring_layout(subgraph, k=2, iterations=50)
+    if pos is None:
+        pos = get_layout(subgraph)
     
     # Draw the subgraph
     nx.draw(subgraph, pos, arrows=True)
@@ -53,14 +118,15 @@ def visualize_graph1(G, highlight_nodes=None, highlight_edges=None, title="Graph
         nx.draw_networkx_edges(subgraph, pos, edgelist=edges_in_subgraph, edge_color='r', width=2)
     
     plt.title(title)
-    st.pyplot(plt)
-    plt.close()
+    return _finish(show)
 
 
 
-def visualize_graph2(G, highlight_nodes=None, highlight_edges=None, title="Graph Visualization"):
+@traced(category="render")
+def visualize_graph2(G, highlight_nodes=None, highlight_edges=None, title="Graph Visualization", pos=None, show=True):
     plt.figure(figsize=(12, 8))
-    pos = nx.spring_layout(G, k=2, iterations=50)
+    if pos is None:
+        pos = get_layout(G)
     
     # Draw the full graph
     nx.draw(G, pos,arrows=True)
@@ -78,8 +144,7 @@ def visualize_graph2(G, highlight_nodes=None, highlight_edges=None, title="Graph
         nx.draw_networkx_edges(G, pos, edgelist=highlight_edges, edge_color='r', width=2)
     
     plt.title(title)
-    st.pyplot(plt)
-    plt.close()  # Close the figure to free up memory
+    return _finish(show)  # Closes the figure to free up memory
 
 
 